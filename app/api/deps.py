@@ -1,4 +1,4 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 from contextlib import contextmanager
 from typing import Annotated, Type
 
@@ -8,14 +8,20 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
+from app.core.cache import TieredCache
 from app.core.config import settings
-from app.core.db import engine
-from app.core.redis import redis_client
+from app.core.db import engine, async_engine
+from app.core.log import logger
+from app.core.redis import redis_client, async_redis_client
 from app.models import TokenPayload, User
 
+user_cache = TieredCache("user", ttl=settings.USER_CACHE_TTL, local_ttl=settings.USER_CACHE_LOCAL_TTL, maxsize=settings.USER_CACHE_MAXSIZE)
+
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
@@ -29,6 +35,11 @@ def get_db() -> Generator[Session, None, None]:
             session.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
 @contextmanager
 def redis_context():
     conn = redis_client
@@ -43,12 +54,18 @@ def get_redis():
         yield redis
 
 
+def get_async_redis():
+    return async_redis_client
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 RedisDep = Annotated[Redis, Depends(get_redis)]
+AsyncRedisDep = Annotated[AsyncRedis, Depends(get_async_redis)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> Type[User]:
+async def get_current_user(token: TokenDep) -> Type[User]:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
@@ -60,12 +77,24 @@ def get_current_user(session: SessionDep, token: TokenDep) -> Type[User]:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # 缓存中不保存密码和用量，需要这些字段的接口自行查询
+    data = await user_cache.aget(str(token_data.sub))
+    if data is None:
+        async with AsyncSession(async_engine) as session:
+            db_user = await session.get(User, token_data.sub)
+        if not db_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        data = db_user.model_dump(exclude={"password", "token_used"})
+        await user_cache.aset(str(token_data.sub), data)
+
+    user = User(**data)
     if not user.status == 1:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
 
+def invalidate_user(user_id: int):
+    user_cache.delete(str(user_id))
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.responses import StreamingResponse
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 压缩后的响应在 ETag 后追加编码，比较时忽略
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def article_etag(article_id: int, version: str) -> str:
+    return f'"{article_id}-{version}"'
+
+
+def content_etag(*parts) -> str:
+    return '"' + hashlib.sha1("\x1f".join(map(str, parts)).encode()).hexdigest()[:16] + '"'
+
+
+def _strip_etag(etag: str) -> str:
+    etag = etag.strip().removeprefix("W/").strip('"')
+    for suffix in ENCODING_SUFFIXES:
+        etag = etag.removesuffix(suffix)
+    return etag
+
+
+def not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or _strip_etag(etag) in {_strip_etag(tag) for tag in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return int(last_modified.timestamp()) <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_headers(etag: str, last_modified: datetime | None = None) -> dict:
+    # 响应因用户而异，客户端可缓存但每次需校验
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def _accepted_encoding(request: Request) -> str | None:
+    accepted = {item.split(";")[0].strip() for item in request.headers.get("accept-encoding", "").split(",")}
+    if brotli and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _vary_accept_encoding(response: Response):
+    vary = [v.strip() for v in response.headers.get("vary", "").split(",") if v.strip()]
+    if "accept-encoding" not in {v.lower() for v in vary}:
+        response.headers["Vary"] = ", ".join([*vary, "Accept-Encoding"])
+
+
+def compress_response(request: Request, response: Response) -> Response:
+    # 无论是否压缩都声明 Vary，避免共享缓存把未压缩的版本返回给支持压缩的客户端，反之亦然
+    _vary_accept_encoding(response)
+    # SSE 等流式响应需要逐条发送，不压缩
+    if isinstance(response, StreamingResponse) or response.status_code in (204, 304):
+        return response
+    if "content-encoding" in response.headers or len(response.body) < settings.COMPRESS_MIN_SIZE:
+        return response
+    encoding = _accepted_encoding(request)
+    if not encoding:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(response.body, quality=settings.COMPRESS_LEVEL)
+    else:
+        body = gzip.compress(response.body, compresslevel=settings.COMPRESS_LEVEL)
+    response.body = body
+    response.headers["Content-Length"] = str(len(body))
+    response.headers["Content-Encoding"] = encoding
+    etag = response.headers.get("etag")
+    if etag:
+        response.headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+    return response
+
+
+class CompressedRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return compress_response(request, await handler(request))
+
+        return route_handler
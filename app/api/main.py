@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.routes import login, users, article
+from app.api.routes import login, users, article, metrics
 
 api_router = APIRouter()
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(article.router, prefix="/article", tags=["article"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
@@ -1,28 +1,107 @@
+import base64
 import json
 import os
-import time
+from datetime import datetime
 from shutil import rmtree
-from typing import Any
+from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
-from sqlmodel import func, select, desc
+from sqlalchemy.dialects.mysql import match
+from sqlmodel import and_, func, or_, select, desc
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
 from app import util
-from app.api.deps import CurrentUser, SessionDep, RedisDep
-from app.enum import EnumArticleStatus, EnumReviewStatus, EnumArticleState
+from app.api.deps import CurrentUser, SessionDep, AsyncSessionDep, RedisDep, AsyncRedisDep
+from app.api.http import CompressedRoute, article_etag, cache_headers, content_etag, not_modified
+from app.core import queue, storm
+from app.core.cache import TieredCache
+from app.core.checkpoint import clear_checkpoint
+from app.core.db import async_engine
+from app.core.ratelimit import RateLimitExceeded
+from app.core.progress import END, progress_key, push_progress, end_progress, parse_event_id
+from app.core.usage import remaining_tokens
+from app.core.views import article_view_cache, build_article_view, get_article_view, invalidate_article_view
+from app.enum import EnumArticleStatus, EnumReviewStatus, EnumArticleState, EnumTokens
 from app.core.config import settings
 from app.core.log import logger
-from app.crud import create_article, update_article, delete_article, reset_article
-from app.models import Article, ArticleCreate, ArticleUpdate, ArticleCreatePublic, ArticleStatePublic, ArticleInfoPublic, ArticlesPublic, Message
+from app.crud import create_article, delete_article, reset_article, update_article_states
+from app.models import User, Article, ArticleContent, ArticleCreate, ArticleCreatePublic, ArticleSearch, ArticleSearchResults, ArticleStatePublic, ArticleInfoPublic, ArticlesPublic, Message
 
 
-router = APIRouter()
+# 非流式响应按 Accept-Encoding 压缩
+router = APIRouter(route_class=CompressedRoute)
+
+# 文章总数，count=cached 时使用；新建和删除时清除不带关键词的计数
+article_count_cache = TieredCache("article_count", ttl=settings.ARTICLE_COUNT_CACHE_TTL, local_ttl=settings.ARTICLE_COUNT_CACHE_LOCAL_TTL)
+# 权限校验只需要所有者和状态，不加载整行
+article_owner_cache = TieredCache("article_owner", ttl=settings.ARTICLE_OWNER_CACHE_TTL, local_ttl=settings.ARTICLE_OWNER_CACHE_LOCAL_TTL, maxsize=settings.ARTICLE_OWNER_CACHE_MAXSIZE)
+
+
+def _owner_statement(article_id: int):
+    return select(Article.owner_id, Article.title, Article.status).where(Article.id == article_id)
+
+
+def _get_owner(session, article_id: int) -> dict | None:
+    owner = article_owner_cache.get(str(article_id))
+    if owner is None:
+        row = session.exec(_owner_statement(article_id)).first()
+        if row is None:
+            return None
+        owner = row._asdict()
+        article_owner_cache.set(str(article_id), owner)
+    return owner
+
+
+async def _aget_owner(session, article_id: int) -> dict | None:
+    owner = await article_owner_cache.aget(str(article_id))
+    if owner is None:
+        row = (await session.exec(_owner_statement(article_id))).first()
+        if row is None:
+            return None
+        owner = row._asdict()
+        await article_owner_cache.aset(str(article_id), owner)
+    return owner
+
+
+def _check_owner(owner: dict | None, user_id: int) -> dict:
+    if not owner:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="主题不存在")
+    if not owner["owner_id"] == user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足")
+    return owner
+
+
+def _check_quota(session, redis_client, current_user):
+    # 登录用户来自缓存，已用额度从数据库读取
+    token_used = session.exec(select(User.token_used).where(User.id == current_user.id)).one()
+    remaining = remaining_tokens(redis_client, current_user.id, token_used)
+    if remaining is not None and remaining < EnumTokens.THRESHOLD_MIN:
+        logger.info(f"User {current_user.id} token quota exhausted, remaining:{remaining}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="对不起，您的 token 额度不足")
+
+
+def _too_busy(retry_after: int = settings.QUEUE_JOB_COST):
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="系统繁忙，请稍后再试",
+                         headers={"Retry-After": str(retry_after)})
+
+
+def _check_queue(redis_client):
+    if settings.QUEUE_MAX_DEPTH and queue.depth(redis_client) >= settings.QUEUE_MAX_DEPTH:
+        raise _too_busy()
+
+
+def _enqueue(redis_client, user_id: int, article_id: int):
+    if not queue.enqueue(redis_client, user_id=user_id, article_id=article_id):
+        # 已创建的主题可稍后通过 resume 重新提交
+        push_progress(redis_client, article_id, "fail_queue_full", "Too many articles waiting, please resume later", code=429)
+        end_progress(redis_client, article_id)
+        raise _too_busy()
 
 
 @router.post("/start-model", response_model=ArticleCreatePublic)
-def start_model(*, session: SessionDep, redis_client: RedisDep, current_user: CurrentUser, article_in: ArticleCreate, background_tasks: BackgroundTasks) -> Any:
+def start_model(*, session: SessionDep, redis_client: RedisDep, current_user: CurrentUser, article_in: ArticleCreate) -> Any:
     user_id = current_user.id
 
     item = session.query(Article).filter_by(title=article_in.title, owner_id=user_id).first()
@@ -30,11 +109,16 @@ def start_model(*, session: SessionDep, redis_client: RedisDep, current_user: Cu
     if item and item.status == EnumArticleStatus.VALID:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="对不起，主题已经存在，请勿重复创建")
 
-    response = storm.check_sensitive_info(article_in.title)
-    if not response:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="系统异常")
+    _check_quota(session, redis_client, current_user)
+    _check_queue(redis_client)
 
-    check_result = response['choices'][0]['message']['content']
+    try:
+        check_result = storm.review_topic(article_in.title)
+    except RateLimitExceeded:
+        # 令牌桶按分钟补充
+        raise _too_busy(60)
+    if not check_result:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="系统异常")
 
     if check_result in [EnumReviewStatus.POINTLESS, EnumReviewStatus.SENSITIVE]:
         if check_result == EnumReviewStatus.POINTLESS:
@@ -44,127 +128,87 @@ def start_model(*, session: SessionDep, redis_client: RedisDep, current_user: Cu
 
     if item and item.status == EnumArticleStatus.DELETED:
         article = reset_article(session=session, db_article=item)
+        clear_checkpoint(redis_client, article.id)
+        invalidate_article_view(article.id)
+        article_owner_cache.delete(str(article.id))
     else:
         article = create_article(session=session, article_in=article_in, owner_id=user_id)
 
-    background_tasks.add_task(_article_generate, session, redis_client=redis_client, user_id=user_id, article=article)
+    article_count_cache.delete(f"{user_id}:")
+    redis_client.delete(progress_key(article.id))
+    # 排队状态在入队前同步写库，不经过本进程的缓冲，避免晚于 worker 写入的状态落库后覆盖它
+    message = "Waiting for an available worker"
+    update_article_states(session=session, states=[{"id": article.id, "state": EnumArticleState.QUEUED, "state_content": message}])
+    push_progress(redis_client, article.id, EnumArticleState.QUEUED, message, persist=False)
+    _enqueue(redis_client, user_id, article.id)
 
     return article
 
 
-def _article_generate(session: SessionDep, redis_client: RedisDep, user_id: int, article: Article):
-    redis_key = _redis_key(article.id)
-    tmp_state = article.state
-
-    if not article.state == EnumArticleState.INIT:
-        redis_client.rpush(redis_key, json.dumps({"state": tmp_state, "message": "Not initiated", "is_done": False, "code": 500}))
-        return
-
-    logger.info(f"Started running runner! State:{tmp_state}")
-
-    tmp_state = "pre_writing"
-    redis_client.rpush(redis_key, json.dumps({"state": tmp_state, "message": "Preparing writing", "is_done": False, "code": 200}))
-
-    runner = storm.set_storm_runner(user_id)
-
-    logger.info(f"Started set storm runner! State:{tmp_state}")
-
-    if tmp_state == "pre_writing":
-        callback_handler = storm.CallbackHandler(redis_client, redis_key)
-        runner.run(
-            topic=article.title,
-            do_research=True,
-            do_generate_outline=True,
-            do_generate_article=False,
-            do_polish_article=False,
-            callback_handler=callback_handler
-        )
-        tmp_state = "pre_writing_end"
-        redis_client.rpush(redis_key, json.dumps({"state": tmp_state, "message": "Start writing and drafting your article (Step 4 / 4)", "is_done": False, "code": 200}))
-
-    if tmp_state == "pre_writing_end":
-        runner.run(
-            topic=article.title,
-            do_research=False,
-            do_generate_outline=False,
-            do_generate_article=True,
-            do_polish_article=True,
-            remove_duplicate=False
-        )
-        runner.post_run()
-        tmp_state = "generate_article_end"
-        redis_client.rpush(redis_key, json.dumps({"state": tmp_state, "message": "generate article and polish article end", "is_done": False, "code": 200}))
-
-    runner.summary()
-    logger.info(f"Finished running runner! State:{tmp_state}")
-
-    if tmp_state == "generate_article_end":
-        directory = util.article_directory(user_id, article.title)
-        logger.info(f"Article_output_dir: {directory}")
-
-        try:
-            with open(f"{directory}/storm_gen_article_polished.txt") as f:
-                final_content = f.read()
-            with open(f"{directory}/url_to_info.json") as f:
-                final_url_to_info = f.read()
-
-            try:
-                summary = final_content
-                if summary[0] == '#':
-                    summary = ''.join(summary.split('\n')[1:])
-
-                update_article(session=session, db_article=article, article_in=ArticleUpdate(
-                    title=article.title,
-                    content_summary=summary[:200],
-                    content=final_content,
-                    url_to_info=final_url_to_info,
-                    state="finish",
-                    state_content=""))
-
-                if settings.DELETE_ARTICLE_OUTPUT_DIR:
-                    rmtree(directory)
-
-                logger.info("Finished updating article in db")
-                redis_client.rpush(redis_key, json.dumps({"state": EnumArticleState.DONE, "message": "", "is_done": True, "code": 200}))
-            except Exception as e:
-                logger.error(f"Failed to update article in db: {e}")
-                redis_client.rpush(redis_key, json.dumps({"state": "fail_db", "message": "Failed to update article in db", "is_done": False, "code": 500}))
-        except Exception as e:
-            logger.error(f"Failed to parse file: {e}")
-            redis_client.rpush(redis_key, json.dumps({"state": "fail_file", "message": "Failed to parse file", "is_done": False, "code": 500}))
-
-    redis_client.rpush(redis_key, "END")
-
-    logger.info("Finished article generation")
-
-
-def _listen_to_stream(session: SessionDep, redis_client: RedisDep, user_id: int, article_id: int):
-    try:
-        article = session.get(Article, article_id)
-        if not article:
-            raise Exception("Article not found")
-        if not article.status == EnumArticleStatus.VALID:
-            raise Exception("Article is not available")
-        if not article.owner_id == user_id:
-            raise Exception("Not enough permissions")
+@router.post("/{article_id}/resume", response_model=ArticleCreatePublic)
+def resume_model(*, session: SessionDep, redis_client: RedisDep, current_user: CurrentUser, article_id: int) -> Any:
+    article = session.get(Article, article_id)
+    if not article or not article.status == EnumArticleStatus.VALID:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="主题不存在")
+    if not article.owner_id == current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足")
+    if article.state == EnumArticleState.DONE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="主题已生成完成")
+    if queue.is_running(redis_client, article.id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="主题正在生成中，请勿重复提交")
+    _check_quota(session, redis_client, current_user)
+    _check_queue(redis_client)
+
+    # 保留数据库中的中断状态，worker 据此从检查点继续；和新任务一样排队，高优先级只用于 worker 恢复的任务
+    redis_client.delete(progress_key(article.id))
+    push_progress(redis_client, article.id, EnumArticleState.QUEUED, "Waiting for an available worker", persist=False)
+    _enqueue(redis_client, current_user.id, article.id)
 
-        if article.state == EnumArticleState.DONE:
-            yield "data: " + json.dumps({"state": EnumArticleState.DONE, "message": "", "is_done": True, "code": 200})
+    return article
+
+
+async def _listen_to_stream(redis_client: AsyncRedisDep, user_id: int, article_id: int, last_event_id: str):
+    try:
+        # 连接只在校验时占用，不随长连接一直持有
+        async with AsyncSession(async_engine) as session:
+            owner = await _aget_owner(session, article_id)
+            if not owner:
+                raise Exception("Article not found")
+            if not owner["status"] == EnumArticleStatus.VALID:
+                raise Exception("Article is not available")
+            if not owner["owner_id"] == user_id:
+                raise Exception("Not enough permissions")
+            state = (await session.exec(select(Article.state).where(Article.id == article_id))).one()
+
+        if state == EnumArticleState.DONE:
+            yield "data: " + json.dumps({"state": EnumArticleState.DONE, "message": "", "is_done": True, "code": 200}) + '\n\n'
             return
 
-        redis_key = _redis_key(article_id)
+        redis_key = progress_key(article_id)
 
-        if not redis_client.exists(redis_key):
-            return Exception("Article is not available")
+        if not await redis_client.exists(redis_key):
+            return
 
-        error_flag = 0
+        idle = 0
         while True:
-            data = redis_client.lpop(redis_key)
-
-            if data:
-                error_flag = 0
-                if data == b"END":  # 检查是否是结束标志
+            # 从客户端最后收到的位置继续读取，不消费事件，多个读者互不影响
+            items = await redis_client.xread({redis_key: last_event_id}, count=100, block=settings.QUEUE_POSITION_INTERVAL * 1000)
+            if not items:
+                idle += settings.QUEUE_POSITION_INTERVAL
+                if idle >= settings.SSE_IDLE_TIMEOUT:  # 超时没变化跳出
                     break
+                # 排队中的任务推送当前位置
+                rank = await redis_client.zrank(queue.QUEUE_KEY, article_id)
+                if rank is not None:
+                    yield "data: " + json.dumps({"state": EnumArticleState.QUEUED, "is_done": False, "code": 200, "position": rank + 1}) + '\n\n'
+                continue
+            idle = 0
+
+            for event_id, fields in items[0][1]:
+                last_event_id = event_id.decode()
+                data = fields[b"data"]
+                if data == END.encode():  # 检查是否是结束标志
+                    return
                 try:
                     json_obj = json.loads(data.decode('utf-8'))
 
@@ -172,96 +216,150 @@ def _listen_to_stream(session: SessionDep, redis_client: RedisDep, user_id: int,
                         tmp_state = json_obj["state"]
                         is_done = json_obj["is_done"]
                         code = json_obj["code"]
-                        update_article(session=session, db_article=article, article_in=ArticleUpdate(title=article.title, state=tmp_state, state_content=json_obj["message"]))
 
-                        yield "data: " + json.dumps({"state": tmp_state, "is_done": is_done, "code": code}) + '\n\n'
+                        event = {"state": tmp_state, "is_done": is_done, "code": code}
+                        if "section" in json_obj:  # 章节的流式文本
+                            event.update(section=json_obj["section"], section_done=json_obj["section_done"], section_reset=json_obj.get("section_reset", False), message=json_obj["message"])
+
+                        yield f"id: {last_event_id}\n" + "data: " + json.dumps(event) + '\n\n'
                 except ValueError as e:
                     logger.error(f"Failed to parse json: {e}")
-            else:
-                if error_flag > 300:  # 5分钟没变化跳出
-                    break
-                time.sleep(1)
-                error_flag += 1
     except Exception as e:
         logger.error(f'Error in listen_to_stream: {e}')
         yield "data: " + json.dumps({"state": "fail_listen_to_stream", "is_done": False, "code": 500}) + '\n\n'
 
 
-def _redis_key(article_id: int):
-    return f"storm:article:generation:{article_id}"
+@router.get("/search", response_model=ArticleSearchResults)
+async def search_articles(*, session: AsyncSessionDep, current_user: CurrentUser, q: str = Query(min_length=1, max_length=50), limit: int = Query(10, gt=0, le=50)) -> Any:
+    # ft_all 过滤，标题、摘要、正文分别加权排序
+    score = (
+        match(ArticleSearch.title, against=q).in_natural_language_mode() * settings.SEARCH_TITLE_WEIGHT
+        + match(ArticleSearch.content_summary, against=q).in_natural_language_mode() * settings.SEARCH_SUMMARY_WEIGHT
+        + match(ArticleSearch.content, against=q).in_natural_language_mode()
+    ).label("score")
+    statement = (
+        select(Article.id, Article.title, Article.content_summary, Article.cdate, score)
+        .select_from(ArticleSearch)
+        .join(Article, Article.id == ArticleSearch.article_id)
+        .where(ArticleSearch.owner_id == current_user.id,
+               match(ArticleSearch.title, ArticleSearch.content_summary, ArticleSearch.content, against=q).in_natural_language_mode(),
+               Article.status == EnumArticleStatus.VALID)
+        .order_by(desc("score"))
+        .limit(limit)
+    )
+    items = (await session.exec(statement)).all()
+
+    return ArticleSearchResults(data=items)
 
 
 @router.get("/{article_id}/update-sse")
-def update_sse(*, session: SessionDep, redis_client: RedisDep, current_user: CurrentUser, article_id: int):
-    return StreamingResponse(_listen_to_stream(session, redis_client, current_user.id, article_id), media_type="text/event-stream")
+def update_sse(*, redis_client: AsyncRedisDep, current_user: CurrentUser, article_id: int, last_event_id: Annotated[str | None, Header()] = None):
+    return StreamingResponse(_listen_to_stream(redis_client, current_user.id, article_id, parse_event_id(last_event_id)), media_type="text/event-stream")
 
 
 @router.get("/{article_id}/state", response_model=ArticleStatePublic)
-def get_state(*, session: SessionDep, current_user: CurrentUser, article_id: int) -> Any:
-    item = session.get(Article, article_id)
-    if not item:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="主题不存在")
-    if not item.owner_id == current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足")
+async def get_state(*, request: Request, response: Response, session: AsyncSessionDep, current_user: CurrentUser, article_id: int) -> Any:
+    _check_owner(await _aget_owner(session, article_id), current_user.id)
+    item = (await session.exec(select(Article.state, Article.state_content).where(Article.id == article_id))).one()
+
+    # 状态在同一秒内可能多次变化，ETag 按内容计算
+    etag = content_etag(article_id, item.state, item.state_content)
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
 
     return ArticleStatePublic(info_message=item.state_content, state=item.state)
 
 
 @router.get("/{article_id}", response_model=ArticleInfoPublic)
-def get_info(*, session: SessionDep, current_user: CurrentUser, article_id: int) -> Any:
-    article = session.get(Article, article_id)
-    if not article:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="主题不存在")
-    if not article.owner_id == current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足")
+async def get_info(*, request: Request, response: Response, session: AsyncSessionDep, current_user: CurrentUser, article_id: int) -> Any:
+    owner = _check_owner(await _aget_owner(session, article_id), current_user.id)
+    article = (await session.exec(select(Article.state, Article.udate, Article.content_hash).where(Article.id == article_id))).one()
+
+    # 已完成的文章不再变化，客户端已有相同版本时直接返回 304
+    if article.state == EnumArticleState.DONE:
+        etag = article_etag(article_id, article.content_hash)
+        if not_modified(request, etag, article.udate):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, article.udate))
+        response.headers.update(cache_headers(etag, article.udate))
+
+    # 优先读取生成时渲染好的内容
+    view = await get_article_view(article_id, article.content_hash)
+    if view is None:
+        row = (await session.exec(select(ArticleContent.content, ArticleContent.url_to_info).where(ArticleContent.article_id == article_id))).first()
+        content, url_to_info = (util.decompress_text(row.content), util.decompress_text(row.url_to_info)) if row else (None, None)
+        if not content:
+            return ArticleInfoPublic(title=owner["title"], content=content, state=article.state, url_to_info=None)
+        view = build_article_view(content, url_to_info, article.content_hash)
+        if article.state == EnumArticleState.DONE:
+            await article_view_cache.aset(str(article_id), view)
 
-    if article.content:
-        if article.content[0] == '#':
-            article.content = '\n'.join(article.content.split('\n')[1:])
-        article.url_to_info = util.construct_citation_dict(article.url_to_info)
-        article.content = util.add_inline_citation_link(article.content, article.url_to_info)
+    return ArticleInfoPublic(title=owner["title"], content=view["content"], state=article.state, url_to_info=view["url_to_info"])
 
-    return article
+
+def _encode_cursor(cdate: datetime, article_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([cdate.isoformat(), article_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        cdate, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(cdate), int(article_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor 无效")
 
 
 @router.get("/", response_model=ArticlesPublic)
-def read_articles(*, session: SessionDep, current_user: CurrentUser, page: int = Query(1, gt=0, le=100), pagesize: int = Query(10, gt=0, le=100), keyword: str | None = None) -> Any:
-    skip = (page - 1) * pagesize
-    count_statement = (
-        select(func.count())
-        .select_from(Article)
-        .where(Article.owner_id == current_user.id, Article.status == EnumArticleStatus.VALID)
-    )
+async def read_articles(*, session: AsyncSessionDep, current_user: CurrentUser, page: int = Query(1, gt=0, le=100), pagesize: int = Query(10, gt=0, le=100), keyword: str | None = None,
+                        cursor: str | None = None, count: Literal["exact", "cached", "none"] = "exact") -> Any:
+    conditions = [Article.owner_id == current_user.id, Article.status == EnumArticleStatus.VALID]
+    if keyword:
+        conditions.append(Article.title.contains(keyword))
+
+    # 按 (cdate, id) 倒序，传入 cursor 时从上一页最后一条之后继续，走 idx_owner_status_cdate 索引
     statement = (
         select(Article.id, Article.title, Article.content_summary, Article.cdate)
         .select_from(Article)
-        .where(Article.owner_id == current_user.id, Article.status == EnumArticleStatus.VALID)
-        .offset(skip)
-        .limit(pagesize)
-        .order_by(desc(Article.cdate))
+        .where(*conditions)
+        .order_by(desc(Article.cdate), desc(Article.id))
+        .limit(pagesize + 1)
     )
-    if keyword:
-        count_statement = count_statement.where(Article.title.contains(keyword))
-        statement = statement.where(Article.title.contains(keyword))
-    count = session.exec(count_statement).one()
-    items = session.exec(statement).all()
+    if cursor:
+        cdate, article_id = _decode_cursor(cursor)
+        statement = statement.where(or_(Article.cdate < cdate, and_(Article.cdate == cdate, Article.id < article_id)))
+    else:
+        statement = statement.offset((page - 1) * pagesize)
+    items = (await session.exec(statement)).all()
+
+    next_cursor = None
+    if len(items) > pagesize:
+        items = items[:pagesize]
+        next_cursor = _encode_cursor(items[-1].cdate, items[-1].id)
+
+    total = None
+    if count != "none":
+        cache_key = f"{current_user.id}:{keyword or ''}"
+        total = await article_count_cache.aget(cache_key) if count == "cached" else None
+        if total is None:
+            total = (await session.exec(select(func.count()).select_from(Article).where(*conditions))).one()
+            if count == "cached":
+                await article_count_cache.aset(cache_key, total)
 
-    return ArticlesPublic(data=items, count=count)
+    return ArticlesPublic(data=items, count=total, next_cursor=next_cursor)
 
 
 @router.delete("/{article_id}")
-def delete_item(*, session: SessionDep, current_user: CurrentUser, article_id: int) -> Message:
-    article = session.get(Article, article_id)
+def delete_item(*, session: SessionDep, redis_client: RedisDep, current_user: CurrentUser, article_id: int) -> Message:
+    _check_owner(_get_owner(session, article_id), current_user.id)
     logger.info(f"delete article {article_id}")
-    if not article:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="主题不存在")
-    if not article.owner_id == current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="权限不足")
-    delete_article(session=session, db_article=article)
-    if not article.status == EnumArticleStatus.DELETED:
+    if not delete_article(session=session, article_id=article_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="主题删除失败")
-    if not settings.DELETE_ARTICLE_OUTPUT_DIR:
-        directory = util.article_directory(current_user.id, article.title)
+    article_owner_cache.delete(str(article_id))
+    clear_checkpoint(redis_client, article_id)
+    article_count_cache.delete(f"{current_user.id}:")
+    invalidate_article_view(article_id)
+    if settings.OUTPUT_MODE == "disk" and not settings.DELETE_ARTICLE_OUTPUT_DIR:
+        directory = util.output_directory(current_user.id, article_id)
         if os.path.exists(directory):
             rmtree(directory)
     return Message(message="主题删除成功")
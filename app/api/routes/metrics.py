@@ -0,0 +1,23 @@
+import os
+from typing import Any
+
+from fastapi import APIRouter
+
+from app.api.deps import CurrentUser
+from app.core.cache import caches
+from app.core.ratelimit import RATE_LIMITS, get_limiter
+
+router = APIRouter()
+
+
+@router.get("/cache")
+def read_cache_metrics(current_user: CurrentUser) -> Any:
+    # 计数为当前进程内的统计
+    return {"pid": os.getpid(), "caches": {name: cache.stats() for name, cache in caches.items()}}
+
+
+@router.get("/ratelimit")
+def read_ratelimit_metrics(current_user: CurrentUser) -> Any:
+    # all 为所有进程汇总的排队等待统计
+    limiters = {name: get_limiter(name) for name in RATE_LIMITS}
+    return {"pid": os.getpid(), "limiters": {name: limiter.stats() for name, limiter in limiters.items() if limiter}}
@@ -4,7 +4,7 @@ from fastapi import APIRouter, HTTPException
 from sqlmodel import func, select
 
 from app import crud
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, SessionDep, invalidate_user
 from app.core.security import get_password_hash, verify_password
 from app.models import Message, User, UserCreate, UpdatePassword, UserPublic, UsersPublic
 
@@ -41,13 +41,16 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
 
 @router.patch("/password", response_model=Message)
 def update_password(*, session: SessionDep, body: UpdatePassword, current_user: CurrentUser) -> Any:
-    if not verify_password(body.current_password, current_user.password):
+    # current_user 来自缓存，不含密码
+    user = session.get(User, current_user.id)
+    if not verify_password(body.current_password, user.password):
         raise HTTPException(status_code=400, detail="Incorrect password")
     if body.current_password == body.new_password:
         raise HTTPException(status_code=400, detail="New password cannot be the same as the current one")
-    current_user.password = get_password_hash(body.new_password)
+    user.password = get_password_hash(body.new_password)
 
-    session.add(current_user)
+    session.add(user)
     session.commit()
+    invalidate_user(user.id)
 
     return Message(message="Password updated successfully")
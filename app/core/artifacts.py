@@ -0,0 +1,50 @@
+import os
+import zlib
+
+from app.core.log import logger
+
+
+# 以 _ 开头的字段为元数据，不写成文件
+def dump_artifacts(redis_client, key: str, directory: str, filenames: list[str], ttl: int, replace: bool = True, meta: dict | None = None) -> bool:
+    mapping = {}
+    for name in filenames:
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            logger.error(f"Artifact {path} not exists, skip dumping {key}")
+            return False
+        with open(path, 'rb') as f:
+            mapping[name] = zlib.compress(f.read())
+
+    if meta:
+        mapping.update(meta)
+
+    pipe = redis_client.pipeline()
+    if replace:
+        pipe.delete(key)
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, ttl)
+    pipe.execute()
+    return True
+
+
+def read_artifacts(directory: str, filenames: list[str]) -> dict[str, str]:
+    artifacts = {}
+    for name in filenames:
+        with open(os.path.join(directory, name)) as f:
+            artifacts[name] = f.read()
+    return artifacts
+
+
+def load_artifacts(redis_client, key: str, directory: str) -> bool:
+    data = redis_client.hgetall(key)
+    if not data:
+        return False
+
+    os.makedirs(directory, exist_ok=True)
+    for name, content in data.items():
+        name = name.decode()
+        if name.startswith('_'):
+            continue
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(zlib.decompress(content))
+    return True
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from app.core.log import logger
+from app.core.redis import redis_client, async_redis_client
+
+caches: dict[str, "TieredCache"] = {}
+
+
+class TieredCache:
+    """In-process LRU in front of redis, values are stored as json."""
+
+    def __init__(self, name: str, ttl: int, local_ttl: int | None = None, maxsize: int = 1024, redis_maxsize: int = 0):
+        self.name = name
+        self.ttl = ttl
+        self.local_ttl = local_ttl if local_ttl is not None else ttl
+        self.maxsize = maxsize
+        self.redis_maxsize = redis_maxsize
+        self._local: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        caches[name] = self
+
+    def _redis_key(self, key: str):
+        return f"storm:cache:{self.name}:{key}"
+
+    def _index_key(self):
+        return f"storm:cache:{self.name}"
+
+    def _get_local(self, key: str):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return item[1]
+
+    def _set_local(self, key: str, value: Any):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def get(self, key: str) -> Any | None:
+        value = self._get_local(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        try:
+            data = redis_client.get(self._redis_key(key))
+        except Exception as e:
+            logger.error(f"Failed to read cache {self.name}: {e}")
+            data = None
+        if data is None:
+            self.misses += 1
+            return None
+
+        value = json.loads(data)
+        self._set_local(key, value)
+        self.redis_hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        self._set_local(key, value)
+        try:
+            if not self.redis_maxsize:
+                redis_client.set(self._redis_key(key), json.dumps(value), ex=self.ttl)
+                return
+
+            # 按写入时间淘汰最早的 key，限制 redis 中的条目数
+            pipe = redis_client.pipeline()
+            pipe.set(self._redis_key(key), json.dumps(value), ex=self.ttl)
+            pipe.zadd(self._index_key(), {key: time.time()})
+            pipe.zremrangebyscore(self._index_key(), 0, time.time() - self.ttl)
+            pipe.zcard(self._index_key())
+            size = pipe.execute()[-1]
+            if size > self.redis_maxsize:
+                evicted = redis_client.zpopmin(self._index_key(), size - self.redis_maxsize)
+                if evicted:
+                    redis_client.delete(*[self._redis_key(k.decode()) for k, _ in evicted])
+        except Exception as e:
+            logger.error(f"Failed to write cache {self.name}: {e}")
+
+    def delete(self, key: str):
+        with self._lock:
+            self._local.pop(key, None)
+        try:
+            redis_client.delete(self._redis_key(key))
+            if self.redis_maxsize:
+                redis_client.zrem(self._index_key(), key)
+        except Exception as e:
+            logger.error(f"Failed to delete cache {self.name}: {e}")
+
+    # 供事件循环上的调用方使用，本地命中时不访问 redis
+    async def aget(self, key: str) -> Any | None:
+        value = self._get_local(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        try:
+            data = await async_redis_client.get(self._redis_key(key))
+        except Exception as e:
+            logger.error(f"Failed to read cache {self.name}: {e}")
+            data = None
+        if data is None:
+            self.misses += 1
+            return None
+
+        value = json.loads(data)
+        self._set_local(key, value)
+        self.redis_hits += 1
+        return value
+
+    async def aset(self, key: str, value: Any):
+        if self.redis_maxsize:
+            await asyncio.to_thread(self.set, key, value)
+            return
+
+        self._set_local(key, value)
+        try:
+            await async_redis_client.set(self._redis_key(key), json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Failed to write cache {self.name}: {e}")
+
+    def stats(self) -> dict:
+        hits = self.local_hits + self.redis_hits
+        total = hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0,
+            "size": len(self._local),
+        }
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share the result of the first call."""
+
+    def __init__(self):
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if not shared:
+                future = Future()
+                self._calls[key] = future
+        if shared:
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
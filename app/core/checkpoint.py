@@ -0,0 +1,41 @@
+from app.core.artifacts import dump_artifacts, load_artifacts
+from app.core.config import settings
+from app.enum import EnumArticleStage
+
+STAGES = [EnumArticleStage.RESEARCH, EnumArticleStage.OUTLINE, EnumArticleStage.ARTICLE, EnumArticleStage.POLISH]
+
+# 每个阶段完成后落盘的文件，后续阶段由 runner 从目录中加载
+STAGE_ARTIFACTS = {
+    EnumArticleStage.RESEARCH: ["conversation_log.json", "raw_search_results.json"],
+    EnumArticleStage.OUTLINE: ["storm_gen_outline.txt", "direct_gen_outline.txt"],
+    EnumArticleStage.ARTICLE: ["storm_gen_article.txt", "url_to_info.json"],
+    EnumArticleStage.POLISH: ["storm_gen_article_polished.txt"],
+}
+
+STAGE_FIELD = "_stage"
+
+
+def checkpoint_key(article_id: int):
+    return f"storm:article:checkpoint:{article_id}"
+
+
+def save_checkpoint(redis_client, article_id: int, stage: str, directory: str) -> bool:
+    return dump_artifacts(redis_client, checkpoint_key(article_id), directory, STAGE_ARTIFACTS[stage],
+                          settings.CHECKPOINT_TTL, replace=False, meta={STAGE_FIELD: stage})
+
+
+def load_checkpoint(redis_client, article_id: int, directory: str) -> str | None:
+    stage = redis_client.hget(checkpoint_key(article_id), STAGE_FIELD)
+    if stage is None or not load_artifacts(redis_client, checkpoint_key(article_id), directory):
+        return None
+    return stage.decode()
+
+
+def clear_checkpoint(redis_client, article_id: int):
+    redis_client.delete(checkpoint_key(article_id))
+
+
+def pending_stages(finished: str | None) -> list[str]:
+    if finished not in STAGES:
+        return STAGES
+    return STAGES[STAGES.index(finished) + 1:]
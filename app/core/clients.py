@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+
+import httpx
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.core.config import settings
+
+
+# 进程内共享的 HTTP 客户端，复用 keep-alive 连接，每个进程只建立一次
+@cache
+def openai_client() -> openai.OpenAI:
+    limits = httpx.Limits(max_connections=settings.HTTP_POOL_MAXSIZE, max_keepalive_connections=settings.HTTP_POOL_MAXSIZE)
+    return openai.OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        timeout=settings.LLM_TIMEOUT,
+        http_client=httpx.Client(limits=limits, timeout=settings.LLM_TIMEOUT),
+    )
+
+
+@cache
+def http_session() -> requests.Session:
+    session = requests.Session()
+    # 检索接口幂等，连接错误、429 和 5xx 按指数退避重试
+    retry = Retry(
+        total=settings.SEARCH_RETRIES,
+        backoff_factor=settings.SEARCH_RETRY_BACKOFF,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(pool_connections=settings.HTTP_POOL_MAXSIZE, pool_maxsize=settings.HTTP_POOL_MAXSIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@cache
+def search_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=settings.SEARCH_MAX_WORKERS, thread_name_prefix="search")
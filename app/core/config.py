@@ -6,6 +6,7 @@ from pydantic import (
     BeforeValidator,
     computed_field,
     MySQLDsn,
+    PositiveInt,
     RedisDsn
 )
 from pydantic_core import MultiHostUrl
@@ -54,6 +55,12 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASSWORD: str = ""
     DB_DEBUG: bool = False
+    # 同步和异步引擎各自的连接池
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_PRE_PING: bool = True
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -67,11 +74,30 @@ class Settings(BaseSettings):
             path=self.DB_DATABASE,
         )
 
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> MySQLDsn:
+        return MultiHostUrl.build(
+            scheme="mysql+aiomysql",
+            username=self.DB_USER,
+            password=self.DB_PASSWORD,
+            host=self.DB_HOST,
+            port=self.DB_PORT,
+            path=self.DB_DATABASE,
+        )
+
     REDIS_HOST: str
     REDIS_PORT: int = 6379
     REDIS_USER: str | None = None
     REDIS_PASSWORD: str | None = None
     REDIS_DB: str | None = None
+    SSE_IDLE_TIMEOUT: int = 300
+    PROGRESS_TTL: int = 60 * 60 * 24
+    PROGRESS_MAXLEN: int = 5000
+    # 流式文本推送间隔(ms)
+    STREAM_FLUSH_INTERVAL: int = 500
+    # 文章状态合并写入 MySQL 的间隔(ms)
+    STATE_FLUSH_INTERVAL: int = 500
 
     @property
     def REDIS_URI(self) -> RedisDsn:
@@ -85,8 +111,100 @@ class Settings(BaseSettings):
     SERPER_API_KEY: str = ""
     OUTPUT_DIR: str = ""
     DELETE_ARTICLE_OUTPUT_DIR: bool = True
+    # 生成过程中间文件的位置，memory 写到内存文件系统，结果入库后即删除
+    OUTPUT_MODE: Literal["disk", "memory"] = "disk"
+    MEMORY_OUTPUT_DIR: str = "/dev/shm/storm"
 
     HTTP_PROXY: str = ""
+    HTTP_POOL_MAXSIZE: int = 20
+    LLM_TIMEOUT: int = 120
+    SEARCH_TIMEOUT: int = 15
+    SEARCH_RETRIES: int = 3
+    SEARCH_RETRY_BACKOFF: float = 0.5
+    SEARCH_MAX_WORKERS: int = 16
+
+    REVIEW_CACHE_TTL: int = 60 * 60 * 24 * 7
+    REVIEW_CACHE_LOCAL_TTL: int = 60 * 10
+    REVIEW_CACHE_MAXSIZE: int = 10000
+    # 检索结果缓存(秒)，0 表示不缓存
+    SEARCH_CACHE_TTL: int = 60 * 60 * 6
+    SEARCH_CACHE_LOCAL_TTL: int = 60 * 10
+    SEARCH_CACHE_MAXSIZE: int = 10000
+    # 模型响应缓存(秒)，0 表示不缓存；按角色关闭，如 article_gen,article_polish
+    LLM_CACHE_TTL: int = 60 * 60 * 24 * 7
+    LLM_CACHE_LOCAL_TTL: int = 60 * 10
+    LLM_CACHE_MAXSIZE: int = 1000
+    LLM_CACHE_REDIS_MAXSIZE: int = 100000
+    LLM_CACHE_DISABLED_ROLES: Annotated[
+        list[str] | str, BeforeValidator(parse_cors)
+    ] = []
+    # 登录用户信息缓存(秒)，本地缓存的时间决定其他进程中禁用用户的生效延迟
+    USER_CACHE_TTL: int = 60 * 5
+    USER_CACHE_LOCAL_TTL: int = 30
+    USER_CACHE_MAXSIZE: int = 10000
+    # 文章列表 count=cached 时总数的缓存(秒)
+    ARTICLE_COUNT_CACHE_TTL: int = 60
+    ARTICLE_COUNT_CACHE_LOCAL_TTL: int = 10
+    # 全文检索排序时标题、摘要相对正文的权重
+    SEARCH_TITLE_WEIGHT: float = 3
+    SEARCH_SUMMARY_WEIGHT: float = 2
+    # 渲染后文章的缓存(秒)
+    ARTICLE_VIEW_CACHE_TTL: int = 60 * 60 * 24 * 7
+    ARTICLE_VIEW_CACHE_LOCAL_TTL: int = 60 * 10
+    ARTICLE_VIEW_CACHE_MAXSIZE: int = 200
+    # 文章所有者、标题和状态的缓存(秒)，删除或重建时失效
+    ARTICLE_OWNER_CACHE_TTL: int = 60 * 60
+    ARTICLE_OWNER_CACHE_LOCAL_TTL: int = 30
+    ARTICLE_OWNER_CACHE_MAXSIZE: int = 10000
+    # 调研结果的有效期(秒)，0 表示不复用
+    CURATION_CACHE_TTL: int = 60 * 60 * 24
+    # 各阶段产物的保留时间(秒)，失败或重启后从最后完成的阶段继续
+    CHECKPOINT_TTL: int = 60 * 60 * 24 * 7
+
+    # 文章接口响应压缩，安装 brotli 后优先使用 br
+    COMPRESS_MIN_SIZE: int = 1024
+    COMPRESS_LEVEL: int = 6
+
+    # 所有 worker 共享的每分钟请求数和 token 数，按账号的速率等级配置，0 表示不限制
+    GPT_4O_RPM: int = 5000
+    GPT_4O_TPM: int = 450000
+    GPT_4O_MINI_RPM: int = 5000
+    GPT_4O_MINI_TPM: int = 2000000
+    SEARCH_RPM: int = 300
+    # 最近活跃的用户均分额度(秒)
+    RATE_LIMIT_FAIR_WINDOW: int = 60
+    RATE_LIMIT_MAX_WAIT: int = 120
+    # 等待超过 RATE_LIMIT_MAX_WAIT 后是否仍然发送请求，默认抛出 RateLimitExceeded
+    RATE_LIMIT_FAIL_OPEN: bool = False
+    # 创建主题时的审查在 API 线程上执行，限流时最多等待的秒数，超过返回 429
+    REVIEW_RATE_LIMIT_MAX_WAIT: float = 1
+
+    # 每个用户的 token 总额度，0 表示不限制；剩余不足 EnumTokens.THRESHOLD_MIN 时不能再生成文章
+    USER_TOKEN_QUOTA: int = 10000000
+    # 用量从 redis 写入数据库的间隔(秒)
+    USAGE_FLUSH_INTERVAL: int = 5
+
+    # 单篇文章并发撰写的章节数，1 为逐节撰写；默认与 STORM 的 max_thread_num 一致
+    ARTICLE_GEN_CONCURRENCY: int = 10
+    ARTICLE_GEN_GLOBAL_CONCURRENCY: int = 32
+
+    # 所有 worker 同时执行的任务上限，0 表示只受 WORKER_CONCURRENCY 限制
+    QUEUE_MAX_RUNNING: int = 16
+    # 排队任务超过该数量时拒绝新任务，0 表示不限制
+    QUEUE_MAX_DEPTH: int = 1000
+    # 公平调度时每个任务计入用户虚拟时间的秒数
+    QUEUE_JOB_COST: int = 180
+    QUEUE_LEASE_TTL: int = 120
+    QUEUE_POLL_INTERVAL: float = 0.5
+    # SSE 推送排队位置的间隔(秒)，同时是读取进度时阻塞的时间，0 会使 redis 一直阻塞
+    QUEUE_POSITION_INTERVAL: PositiveInt = 5
+
+    WORKER_NAME: str = ""
+    WORKER_PROCESSES: int = 1
+    WORKER_CONCURRENCY: int = 2
+    WORKER_DRAIN_TIMEOUT: int = 600
+    # 文章生成锁的有效期(秒)，防止同一篇文章被多个 worker 同时生成
+    ARTICLE_LOCK_TTL: int = 60 * 30
 
 
 settings = Settings()
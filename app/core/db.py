@@ -1,5 +1,17 @@
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import create_engine
 
 from app.core.config import settings
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), echo=settings.DB_DEBUG)
+pool_kwargs = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), echo=settings.DB_DEBUG, **pool_kwargs)
+
+# 读接口在事件循环上执行，不占用线程池
+async_engine = create_async_engine(str(settings.SQLALCHEMY_ASYNC_DATABASE_URI), echo=settings.DB_DEBUG, **pool_kwargs)
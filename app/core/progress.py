@@ -0,0 +1,85 @@
+import json
+import re
+import threading
+import time
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.log import logger
+from app.crud import update_article_states
+
+END = "END"
+
+
+def progress_key(article_id: int):
+    return f"storm:article:generation:{article_id}"
+
+
+def publish(redis_client, article_id: int, data: str):
+    # 使用 stream 保存完整进度，多个读者可各自从任意位置回放
+    key = progress_key(article_id)
+    pipe = redis_client.pipeline()
+    pipe.xadd(key, {"data": data}, maxlen=settings.PROGRESS_MAXLEN, approximate=True)
+    pipe.expire(key, settings.PROGRESS_TTL)
+    pipe.execute()
+
+
+def push_progress(redis_client, article_id: int, state: str, message: str = "", is_done: bool = False, code: int = 200, persist: bool = True, **extra):
+    publish(redis_client, article_id, json.dumps({"state": state, "message": message, "is_done": is_done, "code": code, **extra}))
+    if persist and state != "":
+        state_buffer.put(article_id, state, message)
+
+
+def end_progress(redis_client, article_id: int):
+    publish(redis_client, article_id, END)
+    state_buffer.flush()
+
+
+def parse_event_id(event_id: str | None) -> str:
+    if event_id and re.fullmatch(r"\d+-\d+", event_id):
+        return event_id
+    return "0-0"
+
+
+class StateBuffer:
+    """Coalesce article state writes, only the latest state of each article is flushed periodically."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: dict[int, dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def put(self, article_id: int, state: str, state_content: str):
+        with self._lock:
+            self._pending[article_id] = {"id": article_id, "state": state, "state_content": state_content}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="state-buffer", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        # 串行 flush，保证同一文章后写入的状态不会被先取出的旧状态覆盖
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = list(self._pending.values()), {}
+            if not pending:
+                return
+            try:
+                with Session(engine) as session:
+                    update_article_states(session=session, states=pending)
+            except Exception as e:
+                logger.error(f"Failed to flush article states: {e}")
+                with self._lock:
+                    for item in pending:
+                        self._pending.setdefault(item["id"], item)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+state_buffer = StateBuffer(settings.STATE_FLUSH_INTERVAL / 1000)
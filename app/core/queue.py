@@ -0,0 +1,225 @@
+import json
+
+from app.core.config import settings
+from app.core.log import logger
+from app.enum import EnumJobPriority
+
+# 待执行的任务按 优先级 + 用户虚拟时间 排序，同一用户连续提交的任务依次后移
+QUEUE_KEY = "storm:article:pending"
+JOBS_KEY = "storm:article:pending:jobs"
+VTIME_KEY = "storm:article:pending:vtime"
+# 正在执行的任务租约，score 为到期时间，限制所有 worker 同时执行的任务数
+RUNNING_KEY = "storm:article:running"
+# 租约对应的任务和 worker，租约过期后由任意 worker 回收
+RUNNING_JOBS_KEY = "storm:article:running:jobs"
+RUNNING_WORKERS_KEY = "storm:article:running:workers"
+
+# 优先级为 0 的任务不受队列长度限制
+ENQUEUE_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 1
+end
+local max_depth = tonumber(ARGV[6])
+local priority = tonumber(ARGV[4])
+if max_depth > 0 and priority > 0 and redis.call('ZCARD', KEYS[1]) >= max_depth then
+    return 0
+end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local vtime = math.max(now, tonumber(redis.call('HGET', KEYS[3], ARGV[3]) or 0)) + tonumber(ARGV[5])
+redis.call('HSET', KEYS[3], ARGV[3], vtime)
+redis.call('ZADD', KEYS[1], priority * 1e11 + vtime, ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+return 1
+"""
+
+# 运行中的任务数未达上限时取出队首任务，同时登记租约并放入 worker 的处理中列表
+# 过期的租约留给 RECLAIM_SCRIPT 回收，不计入运行中的任务数
+DEQUEUE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local max_running = tonumber(ARGV[1])
+if max_running > 0 and redis.call('ZCOUNT', KEYS[3], now, '+inf') >= max_running then
+    return false
+end
+local item = redis.call('ZPOPMIN', KEYS[1])
+if #item == 0 then
+    return false
+end
+local job = redis.call('HGET', KEYS[2], item[1])
+redis.call('HDEL', KEYS[2], item[1])
+if not job then
+    return false
+end
+-- 同一文章已有未过期的租约时为重复任务，不覆盖原租约
+local lease = tonumber(redis.call('ZSCORE', KEYS[3], item[1]))
+if not lease or lease < now then
+    redis.call('ZADD', KEYS[3], now + tonumber(ARGV[2]), item[1])
+    redis.call('HSET', KEYS[5], item[1], job)
+    redis.call('HSET', KEYS[6], item[1], ARGV[3])
+end
+redis.call('RPUSH', KEYS[4], job)
+return job
+"""
+
+# 取出所有过期的租约，返回 worker, 任务 交替的列表
+RECLAIM_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local result = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now)) do
+    local job = redis.call('HGET', KEYS[2], id)
+    local worker = redis.call('HGET', KEYS[3], id)
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('HDEL', KEYS[2], id)
+    redis.call('HDEL', KEYS[3], id)
+    if job and worker then
+        table.insert(result, worker)
+        table.insert(result, job)
+    end
+end
+return result
+"""
+
+
+def processing_key(worker_name: str):
+    return f"storm:article:queue:processing:{worker_name}"
+
+
+def enqueue(redis_client, user_id: int, article_id: int, priority: int = EnumJobPriority.NORMAL) -> bool:
+    job = json.dumps({"user_id": user_id, "article_id": article_id})
+    accepted = redis_client.register_script(ENQUEUE_SCRIPT)(
+        keys=[QUEUE_KEY, JOBS_KEY, VTIME_KEY],
+        args=[article_id, job, user_id, priority, settings.QUEUE_JOB_COST, settings.QUEUE_MAX_DEPTH])
+    if not accepted:
+        logger.info(f"Queue is full, reject article generation job: {job}")
+        return False
+
+    logger.info(f"Enqueued article generation job: {job}, priority:{priority}")
+    return True
+
+
+def dequeue(redis_client, worker_name: str):
+    raw = redis_client.register_script(DEQUEUE_SCRIPT)(
+        keys=[QUEUE_KEY, JOBS_KEY, RUNNING_KEY, processing_key(worker_name), RUNNING_JOBS_KEY, RUNNING_WORKERS_KEY],
+        args=[settings.QUEUE_MAX_RUNNING, settings.QUEUE_LEASE_TTL, worker_name])
+    if raw is None:
+        return None, None
+
+    try:
+        return raw, json.loads(raw)
+    except ValueError as e:
+        logger.error(f"Drop malformed job {raw}: {e}")
+        redis_client.lrem(processing_key(worker_name), 1, raw)
+        return None, None
+
+
+def _drop_lease(pipe, article_id: int):
+    pipe.zrem(RUNNING_KEY, article_id)
+    pipe.hdel(RUNNING_JOBS_KEY, article_id)
+    pipe.hdel(RUNNING_WORKERS_KEY, article_id)
+
+
+def ack(redis_client, worker_name: str, raw: bytes, article_id: int | None):
+    pipe = redis_client.pipeline()
+    pipe.lrem(processing_key(worker_name), 1, raw)
+    if article_id is not None:
+        _drop_lease(pipe, article_id)
+    pipe.execute()
+
+
+def renew(redis_client, article_ids: list[int]):
+    if not article_ids:
+        return
+    seconds, microseconds = redis_client.time()
+    expire_at = seconds + microseconds / 1000000 + settings.QUEUE_LEASE_TTL
+    redis_client.zadd(RUNNING_KEY, {article_id: expire_at for article_id in article_ids}, xx=True)
+
+
+def recover(redis_client, worker_name: str) -> int:
+    # 上次异常退出时未完成的任务以高优先级重新排队
+    count = 0
+    while raw := redis_client.lpop(processing_key(worker_name)):
+        try:
+            job = json.loads(raw)
+        except ValueError as e:
+            logger.error(f"Drop malformed job {raw}: {e}")
+            continue
+        pipe = redis_client.pipeline()
+        _drop_lease(pipe, job["article_id"])
+        pipe.execute()
+        enqueue(redis_client, job["user_id"], job["article_id"], priority=EnumJobPriority.HIGH)
+        count += 1
+    if count:
+        logger.info(f"Recovered {count} unfinished jobs of worker {worker_name}")
+    return count
+
+
+def reclaim(redis_client) -> int:
+    # 租约过期说明 worker 已退出或失联（例如换了主机名重新调度），其任务以高优先级重新排队
+    expired = redis_client.register_script(RECLAIM_SCRIPT)(keys=[RUNNING_KEY, RUNNING_JOBS_KEY, RUNNING_WORKERS_KEY])
+    count = 0
+    for worker, raw in zip(expired[::2], expired[1::2]):
+        worker = worker.decode()
+        redis_client.lrem(processing_key(worker), 1, raw)
+        try:
+            job = json.loads(raw)
+        except ValueError as e:
+            logger.error(f"Drop malformed job {raw}: {e}")
+            continue
+        release_article(redis_client, job["article_id"], worker)
+        enqueue(redis_client, job["user_id"], job["article_id"], priority=EnumJobPriority.HIGH)
+        logger.info(f"Reclaimed article {job['article_id']} from worker {worker}, lease expired")
+        count += 1
+    return count
+
+
+def depth(redis_client) -> int:
+    return redis_client.zcard(QUEUE_KEY)
+
+
+def lock_key(article_id: int):
+    return f"storm:article:lock:{article_id}"
+
+
+# 只续期仍属于当前 worker 的锁，返回已不属于自己的锁
+RENEW_LOCK_SCRIPT = """
+local lost = {}
+for _, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('EXPIRE', key, ARGV[2])
+    else
+        table.insert(lost, key)
+    end
+end
+return lost
+"""
+
+
+def acquire_article(redis_client, article_id: int, worker_name: str) -> bool:
+    if redis_client.set(lock_key(article_id), worker_name, nx=True, ex=settings.ARTICLE_LOCK_TTL):
+        return True
+    # 同名 worker 重启后恢复的任务，锁仍属于自己
+    owner = redis_client.get(lock_key(article_id))
+    if owner is not None and owner.decode() == worker_name:
+        redis_client.expire(lock_key(article_id), settings.ARTICLE_LOCK_TTL)
+        return True
+    return False
+
+
+def renew_articles(redis_client, article_ids: list[int], worker_name: str) -> list[str]:
+    if not article_ids:
+        return []
+    lost = redis_client.register_script(RENEW_LOCK_SCRIPT)(
+        keys=[lock_key(article_id) for article_id in article_ids], args=[worker_name, settings.ARTICLE_LOCK_TTL])
+    return [key.decode() for key in lost]
+
+
+def release_article(redis_client, article_id: int, worker_name: str):
+    owner = redis_client.get(lock_key(article_id))
+    if owner is not None and owner.decode() == worker_name:
+        redis_client.delete(lock_key(article_id))
+
+
+def is_running(redis_client, article_id: int) -> bool:
+    return bool(redis_client.exists(lock_key(article_id)))
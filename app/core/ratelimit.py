@@ -0,0 +1,238 @@
+import math
+import random
+import threading
+import time
+
+from app.core.config import settings
+from app.core.log import logger
+from app.core.redis import redis_client
+from app.enum import EnumLLMModel
+
+limiters: dict[str, "RateLimiter"] = {}
+
+# KEYS: 活跃用户 zset, 各令牌桶
+# ARGV: 用户, 活跃窗口(秒), 每个桶依次为 容量, 每秒补充, 本次消耗, 是否按活跃用户均分
+# 所有桶都足够时一起扣减并返回 0，否则不扣减，返回需要等待的秒数
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local window = tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+redis.call('EXPIRE', KEYS[1], math.ceil(window))
+local users = math.max(redis.call('ZCARD', KEYS[1]), 1)
+
+local wait = 0
+local buckets = {}
+for i = 2, #KEYS do
+    local base = 3 + (i - 2) * 4
+    local capacity = tonumber(ARGV[base])
+    local rate = tonumber(ARGV[base + 1])
+    local cost = tonumber(ARGV[base + 2])
+    if ARGV[base + 3] == '1' then
+        capacity = capacity / users
+        rate = rate / users
+    end
+    -- 超过桶容量的请求等桶满后放行
+    cost = math.min(cost, capacity)
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+    buckets[i] = {tokens - cost, math.ceil(capacity / rate) + 1}
+end
+
+if wait == 0 then
+    for i = 2, #KEYS do
+        redis.call('HSET', KEYS[i], 'tokens', buckets[i][1], 'ts', now)
+        redis.call('EXPIRE', KEYS[i], buckets[i][2])
+    end
+end
+return tostring(wait)
+"""
+
+# KEYS: 活跃用户 zset, 各令牌桶
+# ARGV: 活跃窗口(秒), 每个桶依次为 容量, 每秒补充, 调整量, 是否按活跃用户均分
+# 先按当前时间补充再调整，不超过容量；已过期的桶视为已满，只补扣不退回
+ADJUST_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local window = tonumber(ARGV[1])
+local users = math.max(redis.call('ZCOUNT', KEYS[1], now - window, '+inf'), 1)
+
+for i = 2, #KEYS do
+    local base = 2 + (i - 2) * 4
+    local capacity = tonumber(ARGV[base])
+    local rate = tonumber(ARGV[base + 1])
+    local delta = tonumber(ARGV[base + 2])
+    if ARGV[base + 3] == '1' then
+        capacity = capacity / users
+        rate = rate / users
+    end
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1])
+    local ts = tonumber(bucket[2]) or now
+    if tokens or delta < 0 then
+        tokens = math.min(capacity, (tokens or capacity) + math.max(0, now - ts) * rate)
+        tokens = math.min(capacity, tokens + delta)
+        redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now)
+        redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+    end
+end
+return 0
+"""
+
+# 等待时间分布，单位秒
+WAIT_BUCKETS = [0.1, 1, 5, 30, 60]
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class RateLimiter:
+    """Token buckets in redis shared by all workers, per model and per active user."""
+
+    def __init__(self, name: str, rpm: int, tpm: int = 0):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self._script = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._adjust_script = redis_client.register_script(ADJUST_SCRIPT)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        limiters[name] = self
+
+    def _key(self, *parts):
+        return ":".join(["storm:ratelimit", self.name, *map(str, parts)])
+
+    def _buckets(self, user: str, tokens: int) -> tuple[list[str], list]:
+        keys, args = [], []
+        # 全局桶限制总量，用户桶按活跃用户数均分，避免单个用户的突发占满额度
+        for owner, shared in [("global", 0), (f"user:{user}", 1)]:
+            keys.append(self._key(owner, "rpm"))
+            args += [self.rpm, self.rpm / 60, 1, shared]
+            if self.tpm:
+                keys.append(self._key(owner, "tpm"))
+                args += [self.tpm, self.tpm / 60, tokens, shared]
+        return keys, args
+
+    def acquire(self, user_id: int | None = None, tokens: int = 0, max_wait: float | None = None) -> float:
+        user = user_id if user_id is not None else "-"
+        max_wait = settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        keys, args = self._buckets(user, tokens)
+        start = time.monotonic()
+        while True:
+            try:
+                wait = float(self._script(keys=[self._key("users"), *keys], args=[user, settings.RATE_LIMIT_FAIR_WINDOW, *args]))
+            except Exception as e:
+                # redis 不可用时不限流
+                logger.error(f"Failed to acquire rate limit {self.name}: {e}")
+                break
+            if wait <= 0:
+                break
+
+            remaining = max_wait - (time.monotonic() - start)
+            if remaining <= 0:
+                logger.warning(f"Rate limit {self.name} waited over {max_wait}s, user:{user}")
+                # 持续过载时放行会让所有等待的请求同时发出，默认放弃本次请求
+                if settings.RATE_LIMIT_FAIL_OPEN:
+                    break
+                self._record(time.monotonic() - start, rejected=True)
+                raise RateLimitExceeded(f"Rate limit {self.name} waited over {max_wait}s")
+            time.sleep(min(wait, remaining) + random.uniform(0, 0.05))
+
+        waited = time.monotonic() - start
+        self._record(waited)
+        return waited
+
+    def adjust(self, user_id: int | None, tokens: int):
+        # 按实际用量修正预估的 token，正数为退回，负数为补扣
+        if not self.tpm or not tokens:
+            return
+        user = user_id if user_id is not None else "-"
+        keys, args = [], []
+        for owner, shared in [("global", 0), (f"user:{user}", 1)]:
+            keys.append(self._key(owner, "tpm"))
+            args += [self.tpm, self.tpm / 60, tokens, shared]
+        try:
+            self._adjust_script(keys=[self._key("users"), *keys], args=[settings.RATE_LIMIT_FAIR_WINDOW, *args])
+        except Exception as e:
+            logger.error(f"Failed to adjust rate limit {self.name}: {e}")
+
+    def _record(self, waited: float, rejected: bool = False):
+        throttled = waited >= WAIT_BUCKETS[0]
+        with self._lock:
+            self.requests += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if throttled:
+                self.throttled += 1
+            if rejected:
+                self.rejected += 1
+
+        # 等待发生在 worker 进程，汇总到 redis 供接口查询
+        try:
+            le = next((str(b) for b in WAIT_BUCKETS if waited <= b), "inf")
+            pipe = redis_client.pipeline()
+            pipe.hincrby(self._key("metrics"), "requests", 1)
+            pipe.hincrbyfloat(self._key("metrics"), "wait_seconds", waited)
+            pipe.hincrby(self._key("metrics"), f"wait_le_{le}", 1)
+            if throttled:
+                pipe.hincrby(self._key("metrics"), "throttled", 1)
+            if rejected:
+                pipe.hincrby(self._key("metrics"), "rejected", 1)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record rate limit metrics {self.name}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            local = {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+            }
+        try:
+            shared = {k.decode(): float(v) for k, v in redis_client.hgetall(self._key("metrics")).items()}
+        except Exception as e:
+            logger.error(f"Failed to read rate limit metrics {self.name}: {e}")
+            shared = {}
+        requests = shared.get("requests", 0)
+        shared["avg_wait_seconds"] = round(shared.get("wait_seconds", 0) / requests, 3) if requests else 0
+
+        return {"rpm": self.rpm, "tpm": self.tpm, "process": local, "all": shared}
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int, n: int = 1) -> int:
+    # 中英文混合按 2 个字符一个 token 粗略估计，请求完成后按实际用量修正
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return math.ceil(chars / 2) + max_tokens * n
+
+
+RATE_LIMITS = {
+    EnumLLMModel.GPT_4O: (settings.GPT_4O_RPM, settings.GPT_4O_TPM),
+    EnumLLMModel.GPT_4O_MINI: (settings.GPT_4O_MINI_RPM, settings.GPT_4O_MINI_TPM),
+    EnumLLMModel.RM: (settings.SEARCH_RPM, 0),
+}
+
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> RateLimiter | None:
+    rpm, tpm = RATE_LIMITS.get(name, (0, 0))
+    if not rpm:
+        return None
+    with _limiters_lock:
+        if name not in limiters:
+            RateLimiter(name, rpm, tpm)
+        return limiters[name]
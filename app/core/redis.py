@@ -1,4 +1,8 @@
 import redis
+import redis.asyncio
 from app.core.config import settings
 
 redis_client = redis.StrictRedis.from_url(settings.REDIS_URI.__str__())
+
+# SSE 等长连接在事件循环上共用
+async_redis_client = redis.asyncio.StrictRedis.from_url(settings.REDIS_URI.__str__())
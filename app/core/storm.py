@@ -1,58 +1,102 @@
+import hashlib
 import json
 import os
+import re
 import threading
-from typing import Literal, Any, Callable, Union, List
+import time
+from contextlib import nullcontext
+from functools import cache
+from typing import Literal, Any, Callable, Union, List, Optional
 
 import dspy
-import requests
 from knowledge_storm import (
     STORMWikiRunnerArguments,
     STORMWikiRunner,
     STORMWikiLMConfigs,
 )
-from knowledge_storm.rm import SerperRM
 from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
 
+from app import util
+from app.core.cache import TieredCache, SingleFlight
+from app.core.clients import openai_client, http_session, search_executor
 from app.core.config import settings
 from app.core.log import logger
-from app.enum import EnumLLMModel
+from app.core.progress import push_progress
+from app.core.ratelimit import estimate_tokens, get_limiter
+from app.core.usage import record_usage
+from app.enum import EnumLLMModel, EnumReviewStatus
 
+review_cache = TieredCache("review", ttl=settings.REVIEW_CACHE_TTL, local_ttl=settings.REVIEW_CACHE_LOCAL_TTL, maxsize=settings.REVIEW_CACHE_MAXSIZE)
+search_cache = TieredCache("search", ttl=settings.SEARCH_CACHE_TTL, local_ttl=settings.SEARCH_CACHE_LOCAL_TTL, maxsize=settings.SEARCH_CACHE_MAXSIZE)
+search_flight = SingleFlight()
+# 进程内所有文章同时撰写章节的上限
+article_gen_semaphore = threading.BoundedSemaphore(settings.ARTICLE_GEN_GLOBAL_CONCURRENCY)
+llm_cache = TieredCache("llm", ttl=settings.LLM_CACHE_TTL, local_ttl=settings.LLM_CACHE_LOCAL_TTL, maxsize=settings.LLM_CACHE_MAXSIZE, redis_maxsize=settings.LLM_CACHE_REDIS_MAXSIZE)
 
-def set_storm_runner(user_id: int) -> STORMWikiRunner:
-    current_working_dir = os.path.join(settings.OUTPUT_DIR, str(user_id))
+
+def _lm_cache(role: str) -> bool:
+    return settings.LLM_CACHE_TTL > 0 and role not in settings.LLM_CACHE_DISABLED_ROLES
+
+
+def set_storm_runner(user_id: int, article_id: int) -> STORMWikiRunner:
+    current_working_dir = util.output_directory(user_id, article_id)
     if not os.path.exists(current_working_dir):
         os.makedirs(current_working_dir)
     logger.info(f"Successfully current_working_dir:{current_working_dir}")
 
+    # 模型实例只保存本文章的 token 统计，HTTP 连接由进程内共享的 client 复用
     llm_configs = STORMWikiLMConfigs()
-    llm_configs.init_openai_model(openai_api_key=settings.OPENAI_API_KEY, openai_type='openai')
 
-    openai_kwargs = {'api_key': settings.OPENAI_API_KEY, 'api_provider': 'openai', 'temperature': 1.0, 'top_p': 0.9}
+    openai_kwargs = {'api_key': settings.OPENAI_API_KEY, 'api_provider': 'openai', 'temperature': 1.0, 'top_p': 0.9, 'user_id': user_id, 'article_id': article_id}
 
-    llm_configs.set_conv_simulator_lm(OpenAIModel(model=EnumLLMModel.GPT_4O_MINI, max_tokens=500, **openai_kwargs))
-    llm_configs.set_question_asker_lm(OpenAIModel(model=EnumLLMModel.GPT_4O_MINI, max_tokens=500, **openai_kwargs))
-    llm_configs.set_outline_gen_lm(OpenAIModel(model=EnumLLMModel.GPT_4O, max_tokens=400, **openai_kwargs))
-    llm_configs.set_article_gen_lm(OpenAIModel(model=EnumLLMModel.GPT_4O, max_tokens=700, **openai_kwargs))
-    llm_configs.set_article_polish_lm(OpenAIModel(model=EnumLLMModel.GPT_4O, max_tokens=4000, **openai_kwargs))
+    llm_configs.set_conv_simulator_lm(OpenAIModel(model=EnumLLMModel.GPT_4O_MINI, max_tokens=500, cache=_lm_cache('conv_simulator'), **openai_kwargs))
+    llm_configs.set_question_asker_lm(OpenAIModel(model=EnumLLMModel.GPT_4O_MINI, max_tokens=500, cache=_lm_cache('question_asker'), **openai_kwargs))
+    llm_configs.set_outline_gen_lm(OpenAIModel(model=EnumLLMModel.GPT_4O, max_tokens=400, cache=_lm_cache('outline_gen'), **openai_kwargs))
+    llm_configs.set_article_gen_lm(OpenAIModel(model=EnumLLMModel.GPT_4O, max_tokens=700, cache=_lm_cache('article_gen'), concurrency=article_gen_semaphore, **openai_kwargs))
+    llm_configs.set_article_polish_lm(OpenAIModel(model=EnumLLMModel.GPT_4O, max_tokens=4000, cache=_lm_cache('article_polish'), **openai_kwargs))
 
     engine_args = STORMWikiRunnerArguments(output_dir=current_working_dir, max_conv_turn=3, max_perspective=3, search_top_k=3, retrieve_top_k=5)
     logger.info("Successfully set up engine args")
 
     if EnumLLMModel.RM == 'YouRM':
-        rm = YouRM(ydc_api_key=settings.YDC_API_KEY, k=engine_args.search_top_k)
+        rm = YouRM(ydc_api_key=settings.YDC_API_KEY, k=engine_args.search_top_k, user_id=user_id)
     else:
         data = {"autocorrect": True, "location": "China", "gl": "cn", "hl": "zh-cn", "num": 10, "page": 1}
-        rm = SerperRM(serper_search_api_key=settings.SERPER_API_KEY, query_params=data)
+        rm = SerperRM(serper_search_api_key=settings.SERPER_API_KEY, query_params=data, user_id=user_id)
+    if settings.SEARCH_CACHE_TTL:
+        rm = CachedRM(rm, EnumLLMModel.RM)
     logger.info("Successfully get rm")
 
     runner = STORMWikiRunner(engine_args, llm_configs, rm)
+    # 章节并发数单独配置，不影响调研阶段的线程数
+    runner.storm_article_generation.max_thread_num = settings.ARTICLE_GEN_CONCURRENCY
     logger.info("Successfully get runner")
 
     return runner
 
 
+@cache
+def _review_model():
+    return OpenAIModel(model=EnumLLMModel.GPT_4O_MINI, max_tokens=10, api_key=settings.OPENAI_API_KEY, api_provider='openai', temperature=1.0, top_p=0.9,
+                       rate_limit_wait=settings.REVIEW_RATE_LIMIT_MAX_WAIT)
+
+
+def curation_cache_key(topic: str, engine_args: STORMWikiRunnerArguments) -> str:
+    # 相同主题和检索参数的调研结果可以跨用户复用
+    params = {
+        "topic": util.normalize_topic(topic),
+        "rm": EnumLLMModel.RM,
+        "lm": EnumLLMModel.GPT_4O_MINI,
+        "max_conv_turn": engine_args.max_conv_turn,
+        "max_perspective": engine_args.max_perspective,
+        "max_search_queries_per_turn": engine_args.max_search_queries_per_turn,
+        "search_top_k": engine_args.search_top_k,
+    }
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"storm:curation:{digest}"
+
+
 def check_sensitive_info(text: str):
-    ai_model = OpenAIModel(model='gpt-4o-mini-2024-07-18', max_tokens=10, api_key=settings.OPENAI_API_KEY, api_provider='openai', temperature=1.0, top_p=0.9)
     prompt = (
         "Please determine if the following topic complies with regulations:\n"
         "1. The topic must be meaningful and specific. Vague or irrelevant content (e.g., random numbers, single words without context) is not acceptable. tag '1'\n"
@@ -61,23 +105,112 @@ def check_sensitive_info(text: str):
         "===\n"
         f"[{text}]"
     )
-    response = ai_model.request(prompt)
+    response = _review_model().request(prompt)
 
     return response
 
 
+def review_topic(text: str) -> str | None:
+    key = hashlib.sha256(util.normalize_topic(text).encode()).hexdigest()
+    check_result = review_cache.get(key)
+    if check_result is not None:
+        return check_result
+
+    response = check_sensitive_info(text)
+    if not response:
+        return None
+
+    check_result = response['choices'][0]['message']['content']
+    # 只缓存明确的审查结果
+    if check_result in [EnumReviewStatus.ALLOWED, EnumReviewStatus.POINTLESS, EnumReviewStatus.SENSITIVE]:
+        review_cache.set(key, check_result)
+
+    return check_result
+
+
 class OpenAIModel(dspy.OpenAI):
     def __init__(
             self,
             model: str = "gpt-4o-mini",
             api_key: str | None = None,
             model_type: Literal["chat", "text"] = None,
+            cache: bool = False,
+            concurrency: threading.Semaphore | None = None,
+            user_id: int | None = None,
+            article_id: int | None = None,
+            rate_limit_wait: float | None = None,
             **kwargs
     ):
         super().__init__(model=model, api_key=api_key, model_type=model_type, **kwargs)
+        self.cache = cache
+        self.concurrency = concurrency
+        # 限流按用户均分额度，用量计入用户和文章
+        self.user_id = user_id
+        self.article_id = article_id
+        # 限流时最多等待的秒数，None 使用 RATE_LIMIT_MAX_WAIT
+        self.rate_limit_wait = rate_limit_wait
+        # 设置后以流式请求补全，stream_handler(prompt, text, done, reset) 接收已生成的文本，请求失败时 reset 为 True
+        self.stream_handler: Optional[Callable[..., None]] = None
         self._token_usage_lock = threading.Lock()
         self.prompt_tokens = 0
         self.completion_tokens = 0
+        self.cache_hits = 0
+        self.cached_prompt_tokens = 0
+        self.cached_completion_tokens = 0
+
+    def basic_request(self, prompt: str, **kwargs):
+        raw_kwargs = kwargs
+
+        kwargs = {**self.kwargs, **kwargs}
+        messages = [{"role": "user", "content": prompt}]
+        if self.system_prompt:
+            messages.insert(0, {"role": "system", "content": self.system_prompt})
+
+        # 重试的请求同样需要令牌
+        limiter = get_limiter(kwargs["model"])
+        estimated = 0
+        if limiter:
+            estimated = estimate_tokens(messages, kwargs.get("max_tokens", 0), kwargs.get("n", 1))
+            limiter.acquire(self.user_id, estimated, max_wait=self.rate_limit_wait)
+
+        if self.stream_handler and kwargs.get("n", 1) == 1:
+            response = self._stream_request(prompt, messages, kwargs)
+        else:
+            response = openai_client().chat.completions.create(messages=messages, **kwargs).model_dump()
+
+        if limiter and response.get("usage"):
+            limiter.adjust(self.user_id, estimated - response["usage"].get("total_tokens", 0))
+
+        self.history.append({"prompt": prompt, "response": response, "kwargs": kwargs, "raw_kwargs": raw_kwargs})
+
+        return response
+
+    def _stream_request(self, prompt: str, messages: list[dict], kwargs: dict):
+        text = ""
+        response = {"choices": [{"index": 0, "finish_reason": None, "message": {"role": "assistant", "content": ""}}], "usage": None}
+        try:
+            stream = openai_client().chat.completions.create(messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs)
+            for chunk in stream:
+                response["id"] = chunk.id
+                response["model"] = chunk.model
+                if chunk.usage:
+                    response["usage"] = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta.content:
+                    text += choice.delta.content
+                    self.stream_handler(prompt, text, False)
+                if choice.finish_reason:
+                    response["choices"][0]["finish_reason"] = choice.finish_reason
+        except Exception:
+            # 丢弃已推送的部分文本，重试时该章节从头推送
+            self.stream_handler(prompt, "", False, reset=True)
+            raise
+        self.stream_handler(prompt, text, True)
+
+        response["choices"][0]["message"]["content"] = text
+        return response
 
     def log_usage(self, response):
         usage_data = response.get('usage')
@@ -85,17 +218,54 @@ class OpenAIModel(dspy.OpenAI):
             with self._token_usage_lock:
                 self.prompt_tokens += usage_data.get('prompt_tokens', 0)
                 self.completion_tokens += usage_data.get('completion_tokens', 0)
+            record_usage(self.user_id, self.article_id, usage_data.get('prompt_tokens', 0), usage_data.get('completion_tokens', 0))
+
+    def log_cache_hit(self, response):
+        usage_data = response.get('usage') or {}
+        with self._token_usage_lock:
+            self.cache_hits += 1
+            self.cached_prompt_tokens += usage_data.get('prompt_tokens', 0)
+            self.cached_completion_tokens += usage_data.get('completion_tokens', 0)
 
     def get_usage_and_reset(self):
-        usage = {
-            self.kwargs.get('model') or self.kwargs.get('engine'):
-                {'prompt_tokens': self.prompt_tokens, 'completion_tokens': self.completion_tokens}
-        }
-        self.prompt_tokens = 0
-        self.completion_tokens = 0
+        model = self.kwargs.get('model') or self.kwargs.get('engine')
+        with self._token_usage_lock:
+            usage = {
+                model: {'prompt_tokens': self.prompt_tokens, 'completion_tokens': self.completion_tokens}
+            }
+            # 命中缓存节省的 token 单独统计，不计入实际用量
+            if self.cache_hits:
+                usage[f'{model} (cached)'] = {'prompt_tokens': self.cached_prompt_tokens, 'completion_tokens': self.cached_completion_tokens}
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.cache_hits = 0
+            self.cached_prompt_tokens = 0
+            self.cached_completion_tokens = 0
 
         return usage
 
+    def _cache_key(self, prompt: str, **kwargs):
+        params = {"prompt": prompt, "system_prompt": self.system_prompt, "kwargs": {**self.kwargs, **kwargs}}
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def cached_request(self, prompt: str, **kwargs):
+        key = self._cache_key(prompt, **kwargs) if self.cache else None
+        response = llm_cache.get(key) if key else None
+        if response is not None:
+            self.log_cache_hit(response)
+            if self.stream_handler and response["choices"]:
+                self.stream_handler(prompt, self._get_choice_text(response["choices"][0]), True)
+            self.history.append({"prompt": prompt, "response": response, "kwargs": {**self.kwargs, **kwargs}, "raw_kwargs": kwargs, "cached": True})
+            return response
+
+        with self.concurrency or nullcontext():
+            response = self.request(prompt, **kwargs)
+        self.log_usage(response)
+        if key and response.get("choices"):
+            llm_cache.set(key, response)
+
+        return response
+
     def __call__(
             self,
             prompt: str,
@@ -111,9 +281,7 @@ class OpenAIModel(dspy.OpenAI):
             f"{prompt}\n"
             "Please answer in Chinese"
         )
-        response = self.request(prompt_modified, **kwargs)
-
-        self.log_usage(response)
+        response = self.cached_request(prompt_modified, **kwargs)
 
         choices = response["choices"]
 
@@ -145,8 +313,18 @@ class OpenAIModel(dspy.OpenAI):
         return completions
 
 
+def _search_concurrently(search: Callable[[str], list[dict]], queries: list[str]) -> list[dict]:
+    # 单个查询直接在当前线程执行，避免在检索线程池内再次提交任务
+    if len(queries) == 1:
+        results = [search(queries[0])]
+    else:
+        results = search_executor().map(search, queries)
+
+    return [r for result in results for r in result]
+
+
 class YouRM(dspy.Retrieve):
-    def __init__(self, ydc_api_key=None, k=3, is_valid_source: Callable = None):
+    def __init__(self, ydc_api_key=None, k=3, is_valid_source: Callable = None, user_id: int | None = None):
         super().__init__(k=k)
         if not ydc_api_key and not os.environ.get("YDC_API_KEY"):
             raise RuntimeError("You must supply ydc_api_key or set environment variable YDC_API_KEY")
@@ -154,6 +332,8 @@ class YouRM(dspy.Retrieve):
             self.ydc_api_key = ydc_api_key
         else:
             self.ydc_api_key = os.environ["YDC_API_KEY"]
+        self.user_id = user_id
+        self._usage_lock = threading.Lock()
         self.usage = 0
 
         if is_valid_source:
@@ -162,65 +342,206 @@ class YouRM(dspy.Retrieve):
             self.is_valid_source = lambda x: True
 
     def get_usage_and_reset(self):
-        usage = self.usage
-        self.usage = 0
+        with self._usage_lock:
+            usage = self.usage
+            self.usage = 0
 
         return {'YouRM': usage}
 
+    def _search(self, query: str, exclude_urls: List[str]) -> list[dict]:
+        try:
+            limiter = get_limiter(EnumLLMModel.RM)
+            if limiter:
+                limiter.acquire(self.user_id)
+            headers = {"X-API-Key": self.ydc_api_key}
+            response = http_session().get(
+                "https://api.ydc-index.io/search",
+                params={"query": query, "country": "CN"},
+                headers=headers,
+                timeout=settings.SEARCH_TIMEOUT,
+            )
+            results = response.json()
+            if 'error_code' in results:
+                raise Exception(f"{results}")
+
+            authoritative_results = []
+            for r in results.get('hits', []):
+                if self.is_valid_source(r['url']) and r['url'] not in exclude_urls:
+                    authoritative_results.append(r)
+            return authoritative_results[:self.k]
+        except Exception as e:
+            logger.error(f'Error occurs when searching query {query}: {e}')
+            return []
+
     def forward(self, query_or_queries: Union[str, List[str]], exclude_urls: List[str] = []):
         queries = (
             [query_or_queries]
             if isinstance(query_or_queries, str)
             else query_or_queries
         )
-        self.usage += len(queries)
+        with self._usage_lock:
+            self.usage += len(queries)
+
+        return _search_concurrently(lambda query: self._search(query, exclude_urls), queries)
+
+
+class SerperRM(dspy.Retrieve):
+    def __init__(self, serper_search_api_key=None, query_params=None, user_id: int | None = None):
+        super().__init__()
+        if not serper_search_api_key and not os.environ.get("SERPER_API_KEY"):
+            raise RuntimeError("You must supply serper_search_api_key or set environment variable SERPER_API_KEY")
+        elif serper_search_api_key:
+            self.serper_search_api_key = serper_search_api_key
+        else:
+            self.serper_search_api_key = os.environ["SERPER_API_KEY"]
+        self.query_params = query_params or {}
+        self.user_id = user_id
+        self._usage_lock = threading.Lock()
+        self.usage = 0
+
+    def get_usage_and_reset(self):
+        with self._usage_lock:
+            usage = self.usage
+            self.usage = 0
+
+        return {'SerperRM': usage}
+
+    def serper_runner(self, query: str):
+        # 多个视角的对话并发检索，每次请求复制参数，不修改共享的 query_params
+        query_params = {**self.query_params, "q": query, "type": "search"}
+        headers = {"X-API-KEY": self.serper_search_api_key, "Content-Type": "application/json"}
+        limiter = get_limiter(EnumLLMModel.RM)
+        if limiter:
+            limiter.acquire(self.user_id)
+        response = http_session().post("https://google.serper.dev/search", headers=headers, json=query_params, timeout=settings.SEARCH_TIMEOUT)
+        response.raise_for_status()
+
+        return response.json()
+
+    def _search(self, query: str, exclude_urls: List[str]) -> list[dict]:
         collected_results = []
-        for query in queries:
-            try:
-                headers = {"X-API-Key": self.ydc_api_key}
-                response = requests.get(
-                    f"https://api.ydc-index.io/search?query={query}&country=CN",
-                    headers=headers,
-                )
-                results = response.json()
-                if 'error_code' in results:
-                    raise Exception(f"{results}")
-
-                authoritative_results = []
-                for r in results['hits']:
-                    if self.is_valid_source(r['url']) and r['url'] not in exclude_urls:
-                        authoritative_results.append(r)
-                if 'hits' in results:
-                    collected_results.extend(authoritative_results[:self.k])
-            except Exception as e:
-                logger.error(f'Error occurs when searching query {query}: {e}')
+        try:
+            results = self.serper_runner(query)
+
+            knowledge_graph = results.get("knowledgeGraph")
+            description = knowledge_graph.get("description") if knowledge_graph else ""
+            for organic in results.get("organic", []):
+                if organic.get("link") in exclude_urls:
+                    continue
+                collected_results.append({
+                    "snippets": [organic.get("snippet")],
+                    "title": organic.get("title"),
+                    "url": organic.get("link"),
+                    "description": description,
+                })
+        except Exception as e:
+            logger.error(f'Error occurs when searching query {query}: {e}')
 
         return collected_results
 
+    def forward(self, query_or_queries: Union[str, List[str]], exclude_urls: List[str] = []):
+        queries = (
+            [query_or_queries]
+            if isinstance(query_or_queries, str)
+            else query_or_queries
+        )
+        queries = [query for query in queries if query != "Queries:"]
+        with self._usage_lock:
+            self.usage += len(queries)
+
+        return _search_concurrently(lambda query: self._search(query, exclude_urls), queries)
+
+
+class CachedRM(dspy.Retrieve):
+    def __init__(self, rm: dspy.Retrieve, name: str):
+        super().__init__(k=rm.k)
+        self.rm = rm
+        self.name = name
+        self._cache_hits_lock = threading.Lock()
+        self.cache_hits = 0
+
+    def get_usage_and_reset(self):
+        usage = self.rm.get_usage_and_reset()
+        with self._cache_hits_lock:
+            usage[f'{self.name}_cache_hits'] = self.cache_hits
+            self.cache_hits = 0
+
+        return usage
+
+    # StormRetriever 会替换检索器的 is_valid_source，需要转给被包装的检索器
+    @property
+    def is_valid_source(self) -> Callable:
+        return self.rm.is_valid_source
+
+    @is_valid_source.setter
+    def is_valid_source(self, value: Callable):
+        self.rm.is_valid_source = value
+
+    def _source_filter(self) -> str | None:
+        fn = getattr(self.rm, "is_valid_source", None)
+        return f"{fn.__module__}.{fn.__qualname__}" if fn else None
+
+    def _cache_key(self, query: str):
+        params = {"rm": self.name, "k": self.rm.k, "query_params": getattr(self.rm, "query_params", None),
+                  "is_valid_source": self._source_filter(), "query": query.strip()}
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def _fetch(self, key: str, query: str):
+        results = self.rm.forward(query, exclude_urls=[])
+        # 检索失败时返回空结果，不缓存
+        if results:
+            search_cache.set(key, results)
+        return results
+
+    def search(self, query: str) -> list[dict]:
+        key = self._cache_key(query)
+        results = search_cache.get(key)
+        shared = results is not None
+        if not shared:
+            results, shared = search_flight.do(key, lambda: self._fetch(key, query))
+        if shared:
+            with self._cache_hits_lock:
+                self.cache_hits += 1
+
+        return results
+
+    def forward(self, query_or_queries: Union[str, List[str]], exclude_urls: List[str] = []):
+        queries = (
+            [query_or_queries]
+            if isinstance(query_or_queries, str)
+            else query_or_queries
+        )
+        results = _search_concurrently(self.search, queries)
+
+        return [r for r in results if r['url'] not in exclude_urls]
+
+
+# STORM 撰写章节时提示词中的章节名
+SECTION_PATTERN = re.compile(r"The section you need to write: (.*)")
+
 
 class CallbackHandler(BaseCallbackHandler):
-    def __init__(self, redis_client, redis_key):
+    def __init__(self, redis_client, article_id):
         self.redis_client = redis_client
-        self.redis_key = redis_key
+        self.article_id = article_id
+        self._stream_lock = threading.Lock()
+        self._streams: dict[str, tuple[int, float]] = {}
 
     def on_identify_perspective_start(self, **kwargs):
         logger.info('on_identify_perspective_start')
 
-        v = json.dumps({"state": "identify_perspective_start", "message": "Start identifying different perspectives for researching the topic. (Step 1 / 4)", "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "identify_perspective_start", "Start identifying different perspectives for researching the topic. (Step 1 / 4)")
 
     def on_identify_perspective_end(self, perspectives: list[str], **kwargs):
         logger.info('on_identify_perspective_end')
 
         perspective_list = "\n- ".join(perspectives)
-        v = json.dumps({"state": "identify_perspective_end", "message": f"Finish identifying perspectives. Will now start gathering information from the following perspectives:\n- {perspective_list}", "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "identify_perspective_end", f"Finish identifying perspectives. Will now start gathering information from the following perspectives:\n- {perspective_list}")
 
     def on_information_gathering_start(self, **kwargs):
         logger.info('on_information_gathering_start')
 
-        v = json.dumps({"state": "information_gathering_start", "message": "Start browsing the Internet. (Step 2 /4)", "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "information_gathering_start", "Start browsing the Internet. (Step 2 /4)")
 
     def on_dialogue_turn_end(self, dlg_turn, **kwargs):
         logger.info('on_dialogue_turn_end')
@@ -229,29 +550,50 @@ class CallbackHandler(BaseCallbackHandler):
         for url in urls:
             msg += f'Finish browsing {url}\n'
 
-        v = json.dumps({"state": "dialogue_turn_end", "message": msg, "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "dialogue_turn_end", msg)
 
     def on_information_gathering_end(self, **kwargs):
         logger.info('on_information_gathering_end')
 
-        v = json.dumps({"state": "information_gathering_start", "message": "Finish collecting information.", "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "information_gathering_start", "Finish collecting information.")
 
     def on_information_organization_start(self, **kwargs):
         logger.info('on_information_organization_start')
 
-        v = json.dumps({"state": "information_organization_start", "message": "Start organizing information into a hierarchical outline. (Step 3 / 4)", "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "information_organization_start", "Start organizing information into a hierarchical outline. (Step 3 / 4)")
 
     def on_direct_outline_generation_end(self, outline: str, **kwargs):
         logger.info('on_direct_outline_generation_end')
 
-        v = json.dumps({"state": "direct_outline_generation_end", "message": "Finish leveraging the internal knowledge of the large language model.", "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "direct_outline_generation_end", "Finish leveraging the internal knowledge of the large language model.")
 
     def on_outline_refinement_end(self, outline: str, **kwargs):
         logger.info('on_outline_refinement_end')
 
-        v = json.dumps({"state": "outline_refinement_end", "message": "Finish leveraging the collected information.", "is_done": False, "code": 200})
-        self.redis_client.rpush(self.redis_key, v)
+        push_progress(self.redis_client, self.article_id, "outline_refinement_end", "Finish leveraging the collected information.")
+
+    def on_lm_stream(self, prompt: str, text: str, done: bool, reset: bool = False):
+        match = SECTION_PATTERN.findall(prompt)
+        section = match[-1].strip() if match else "lead"
+
+        if reset:
+            with self._stream_lock:
+                sent, _ = self._streams.pop(section, (0, 0))
+            # 通知客户端丢弃该章节已收到的文本
+            if sent:
+                push_progress(self.redis_client, self.article_id, "article_partial", "", persist=False, section=section, section_done=False, section_reset=True)
+            return
+
+        # 按章节节流，每隔 STREAM_FLUSH_INTERVAL 推送一次新增的文本
+        with self._stream_lock:
+            sent, last_time = self._streams.get(section, (0, 0))
+            now = time.monotonic()
+            if not done and now - last_time < settings.STREAM_FLUSH_INTERVAL / 1000:
+                return
+            delta = text[sent:]
+            if done:
+                self._streams.pop(section, None)
+            else:
+                self._streams[section] = (len(text), now)
+        if delta or done:
+            push_progress(self.redis_client, self.article_id, "article_partial", delta, persist=False, section=section, section_done=done, section_reset=False)
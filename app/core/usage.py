@@ -0,0 +1,116 @@
+import threading
+import time
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.log import logger
+from app.core.redis import redis_client
+from app.crud import add_token_usage
+
+# 待写入数据库的用量，key 为 user:{id} 或 article:{id}
+DIRTY_KEY = "storm:usage:dirty"
+
+
+def usage_key(member: str):
+    return f"storm:usage:{member}"
+
+
+def record_usage(user_id: int | None, article_id: int | None, prompt_tokens: int, completion_tokens: int):
+    members = []
+    if user_id is not None:
+        members.append(f"user:{user_id}")
+    if article_id is not None:
+        members.append(f"article:{article_id}")
+    if not members or not (prompt_tokens or completion_tokens):
+        return
+
+    try:
+        pipe = redis_client.pipeline()
+        for member in members:
+            pipe.hincrby(usage_key(member), "prompt_tokens", prompt_tokens)
+            pipe.hincrby(usage_key(member), "completion_tokens", completion_tokens)
+        pipe.sadd(DIRTY_KEY, *members)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to record token usage of user {user_id} article {article_id}: {e}")
+        return
+    usage_flusher.start()
+
+
+def pending_tokens(redis_client, user_id: int) -> int:
+    # 已计入 redis 但还未写入数据库的用量
+    return sum(int(v) for v in redis_client.hvals(usage_key(f"user:{user_id}")))
+
+
+def remaining_tokens(redis_client, user_id: int, token_used: int) -> int | None:
+    if not settings.USER_TOKEN_QUOTA:
+        return None
+    return settings.USER_TOKEN_QUOTA - token_used - pending_tokens(redis_client, user_id)
+
+
+class UsageFlusher:
+    """Move the token usage counted in redis into mysql periodically."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="usage-flusher", daemon=True)
+                self._thread.start()
+
+    def _take(self, members: list[str]) -> dict[str, dict]:
+        # 取出并清空计数，之后新增的用量会重新标记
+        pipe = redis_client.pipeline(transaction=True)
+        for member in members:
+            pipe.hgetall(usage_key(member))
+            pipe.delete(usage_key(member))
+        results = pipe.execute()[::2]
+        return {member: {k.decode(): int(v) for k, v in data.items()} for member, data in zip(members, results) if data}
+
+    def _restore(self, taken: dict[str, dict]):
+        pipe = redis_client.pipeline()
+        for member, data in taken.items():
+            for field, value in data.items():
+                pipe.hincrby(usage_key(member), field, value)
+        pipe.sadd(DIRTY_KEY, *taken.keys())
+        pipe.execute()
+
+    def flush(self):
+        with self._flush_lock:
+            try:
+                members = [m.decode() for m in redis_client.spop(DIRTY_KEY, 1000) or []]
+                taken = self._take(members) if members else {}
+            except Exception as e:
+                logger.error(f"Failed to take token usage: {e}")
+                return
+            if not taken:
+                return
+
+            users, articles = {}, {}
+            for member, data in taken.items():
+                kind, _, id_ = member.partition(":")
+                (users if kind == "user" else articles)[int(id_)] = data
+            try:
+                with Session(engine) as session:
+                    add_token_usage(session=session, users=users, articles=articles)
+            except Exception as e:
+                logger.error(f"Failed to flush token usage: {e}")
+                try:
+                    self._restore(taken)
+                except Exception as e:
+                    logger.error(f"Failed to restore token usage {taken}: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+usage_flusher = UsageFlusher(settings.USAGE_FLUSH_INTERVAL)
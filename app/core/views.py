@@ -0,0 +1,28 @@
+from app import util
+from app.core.cache import TieredCache
+from app.core.config import settings
+
+# 渲染后的文章，生成完成时写入；读取时比对 content_hash，内容变化后自动失效，状态和用量的更新不影响
+article_view_cache = TieredCache("article_view", ttl=settings.ARTICLE_VIEW_CACHE_TTL, local_ttl=settings.ARTICLE_VIEW_CACHE_LOCAL_TTL, maxsize=settings.ARTICLE_VIEW_CACHE_MAXSIZE)
+
+
+def build_article_view(content: str, url_to_info, version: str) -> dict:
+    content, citation_dict = util.render_article(content, url_to_info)
+    return {"version": version, "content": content, "url_to_info": citation_dict}
+
+
+def cache_article_view(article_id: int, content: str, url_to_info, version: str) -> dict:
+    view = build_article_view(content, url_to_info, version)
+    article_view_cache.set(str(article_id), view)
+    return view
+
+
+async def get_article_view(article_id: int, version: str) -> dict | None:
+    view = await article_view_cache.aget(str(article_id))
+    if view is None or view.get("version") != version:
+        return None
+    return view
+
+
+def invalidate_article_view(article_id: int):
+    article_view_cache.delete(str(article_id))
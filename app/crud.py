@@ -1,10 +1,11 @@
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlmodel import Session, delete, select, update
 
 from app.enum import EnumArticleStatus, EnumArticleState
 from app.core.security import verify_password, get_password_hash
-from app.models import Article, ArticleCreate, ArticleUpdate, User, UserCreate
+from app import util
+from app.models import Article, ArticleContent, ArticleCreate, ArticleSearch, ArticleUpdate, User, UserCreate
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -42,24 +43,50 @@ def create_article(*, session: Session, article_in: ArticleCreate, owner_id: int
 
 def update_article(*, session: Session, db_article: Article, article_in: ArticleUpdate) -> Any:
     update_dict = article_in.model_dump(exclude_unset=True)
+    content = update_dict.pop("content", None)
+    url_to_info = update_dict.pop("url_to_info", None)
+    if content:
+        update_dict["content_hash"] = util.content_hash(content, url_to_info)
     db_article.sqlmodel_update(update_dict)
     session.add(db_article)
+    if content:
+        session.merge(ArticleContent(article_id=db_article.id, content=util.compress_text(content), url_to_info=util.compress_text(url_to_info)))
+        session.merge(ArticleSearch(article_id=db_article.id, owner_id=db_article.owner_id, title=db_article.title,
+                                    content_summary=db_article.content_summary or "", content=content))
     session.commit()
     session.refresh(db_article)
     return db_article
 
 
-def delete_article(*, session: Session, db_article: Article) -> Any:
-    db_article.sqlmodel_update({"status": EnumArticleStatus.DELETED})
-    session.add(db_article)
+def update_article_states(*, session: Session, states: list[dict]) -> None:
+    # 按主键批量 UPDATE，不 refresh
+    session.exec(update(Article), params=states)
     session.commit()
-    session.refresh(db_article)
-    return db_article
+
+
+def add_token_usage(*, session: Session, users: dict[int, dict], articles: dict[int, dict]) -> None:
+    # 累加增量，重复执行前需确保计数已从 redis 取出
+    for user_id, usage in users.items():
+        session.exec(update(User).where(User.id == user_id).values(token_used=User.token_used + sum(usage.values())))
+    for article_id, usage in articles.items():
+        session.exec(update(Article).where(Article.id == article_id).values(
+            prompt_tokens=Article.prompt_tokens + usage.get("prompt_tokens", 0),
+            completion_tokens=Article.completion_tokens + usage.get("completion_tokens", 0)))
+    session.commit()
+
+
+def delete_article(*, session: Session, article_id: int) -> bool:
+    result = session.exec(update(Article).where(Article.id == article_id).values(status=EnumArticleStatus.DELETED))
+    session.exec(delete(ArticleSearch).where(ArticleSearch.article_id == article_id))
+    session.commit()
+    return result.rowcount > 0
 
 
 def reset_article(*, session: Session, db_article: Article) -> Any:
-    db_article.sqlmodel_update({"status": EnumArticleStatus.VALID, "state": EnumArticleState.INIT, "content_summary": "", "content": None, "url_to_info": None})
+    db_article.sqlmodel_update({"status": EnumArticleStatus.VALID, "state": EnumArticleState.INIT, "content_summary": "", "content_hash": ""})
     session.add(db_article)
+    session.exec(delete(ArticleContent).where(ArticleContent.article_id == db_article.id))
+    session.exec(delete(ArticleSearch).where(ArticleSearch.article_id == db_article.id))
     session.commit()
     session.refresh(db_article)
     return db_article
@@ -8,9 +8,24 @@ class EnumArticleStatus:
 # 阶段状态
 class EnumArticleState:
     INIT = "initiated"
+    QUEUED = "queued"
     DONE = "completed"
 
 
+# 生成阶段，按顺序执行
+class EnumArticleStage:
+    RESEARCH = "research"
+    OUTLINE = "outline"
+    ARTICLE = "article"
+    POLISH = "polish"
+
+
+# 任务优先级，数值小的先执行
+class EnumJobPriority:
+    HIGH = 0
+    NORMAL = 1
+
+
 # 模型
 class EnumLLMModel:
     GPT_4O = "gpt-4o-2024-08-06"
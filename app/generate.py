@@ -0,0 +1,179 @@
+from shutil import rmtree
+
+from sqlmodel import Session
+
+from app import util
+from app.core import storm
+from app.core.artifacts import dump_artifacts, load_artifacts, read_artifacts
+from app.core.checkpoint import STAGE_ARTIFACTS, clear_checkpoint, load_checkpoint, pending_stages, save_checkpoint
+from app.core.config import settings
+from app.core.log import logger
+from app.core.progress import push_progress, end_progress
+from app.core.usage import usage_flusher
+from app.core.views import cache_article_view
+from app.crud import update_article
+from app.enum import EnumArticleStage, EnumArticleState
+from app.models import Article, ArticleUpdate
+
+
+def _run_research(redis_client, runner, article: Article, directory: str):
+    tmp_state = "pre_writing"
+    push_progress(redis_client, article.id, tmp_state, "Preparing writing")
+
+    # 同主题同配置的调研结果可直接复用
+    curation_key = storm.curation_cache_key(article.title, runner.args)
+    if settings.CURATION_CACHE_TTL and load_artifacts(redis_client, curation_key, directory):
+        logger.info(f"Reuse cached curation {curation_key}")
+        push_progress(redis_client, article.id, "information_gathering_cached", "Reuse the information collected for the same topic. (Step 2 / 4)")
+        return
+
+    runner.run(
+        topic=article.title,
+        do_research=True,
+        do_generate_outline=False,
+        do_generate_article=False,
+        do_polish_article=False,
+        callback_handler=storm.CallbackHandler(redis_client, article.id)
+    )
+
+    if settings.CURATION_CACHE_TTL:
+        dump_artifacts(redis_client, curation_key, directory, STAGE_ARTIFACTS[EnumArticleStage.RESEARCH], settings.CURATION_CACHE_TTL)
+
+
+def _run_outline(redis_client, runner, article: Article, directory: str):
+    runner.run(
+        topic=article.title,
+        do_research=False,
+        do_generate_outline=True,
+        do_generate_article=False,
+        do_polish_article=False,
+        callback_handler=storm.CallbackHandler(redis_client, article.id)
+    )
+
+    tmp_state = "pre_writing_end"
+    push_progress(redis_client, article.id, tmp_state, "Start writing and drafting your article (Step 4 / 4)")
+
+
+def _run_article(redis_client, runner, article: Article, directory: str):
+    runner.run(
+        topic=article.title,
+        do_research=False,
+        do_generate_outline=False,
+        do_generate_article=True,
+        do_polish_article=False
+    )
+
+
+def _run_polish(redis_client, runner, article: Article, directory: str):
+    runner.run(
+        topic=article.title,
+        do_research=False,
+        do_generate_outline=False,
+        do_generate_article=False,
+        do_polish_article=True,
+        remove_duplicate=False
+    )
+
+    tmp_state = "generate_article_end"
+    push_progress(redis_client, article.id, tmp_state, "generate article and polish article end")
+
+
+STAGE_RUNNERS = {
+    EnumArticleStage.RESEARCH: _run_research,
+    EnumArticleStage.OUTLINE: _run_outline,
+    EnumArticleStage.ARTICLE: _run_article,
+    EnumArticleStage.POLISH: _run_polish,
+}
+
+
+# 最终结果，读取后直接入库
+RESULT_ARTIFACTS = ["storm_gen_article_polished.txt", "url_to_info.json"]
+
+
+def article_generate(session: Session, redis_client, user_id: int, article: Article):
+    try:
+        _article_generate(session, redis_client, user_id, article)
+    finally:
+        # 内存文件系统中的中间文件不保留，失败后由检查点恢复
+        if settings.OUTPUT_MODE == "memory":
+            rmtree(util.output_directory(user_id, article.id), ignore_errors=True)
+
+
+def _article_generate(session: Session, redis_client, user_id: int, article: Article):
+    if article.state == EnumArticleState.DONE:
+        logger.info(f"Article {article.id} already completed")
+        push_progress(redis_client, article.id, EnumArticleState.DONE, "", is_done=True, persist=False)
+        end_progress(redis_client, article.id)
+        return
+
+    directory = util.article_directory(user_id, article.id, article.title)
+
+    # 新任务清掉旧的检查点；其余状态视为中断的任务，从最后完成的阶段继续
+    finished = None
+    if article.state in [EnumArticleState.INIT, EnumArticleState.QUEUED]:
+        clear_checkpoint(redis_client, article.id)
+    else:
+        finished = load_checkpoint(redis_client, article.id, directory)
+
+    stages = pending_stages(finished)
+    if finished:
+        push_progress(redis_client, article.id, "resume_from_checkpoint", f"Resume after the {finished} stage")
+    logger.info(f"Started running runner! State:{article.state} Checkpoint:{finished} Stages:{stages}")
+
+    runner = storm.set_storm_runner(user_id, article.id)
+    # 章节撰写和润色阶段的导语生成都使用 article_gen_lm，文本实时推送给 SSE 客户端
+    runner.lm_configs.article_gen_lm.stream_handler = storm.CallbackHandler(redis_client, article.id).on_lm_stream
+
+    logger.info(f"Started set storm runner! Article:{article.id}")
+
+    for stage in stages:
+        STAGE_RUNNERS[stage](redis_client, runner, article, directory)
+        if not save_checkpoint(redis_client, article.id, stage, directory):
+            logger.error(f"Failed to save checkpoint {stage} of article {article.id}")
+
+    if EnumArticleStage.POLISH in stages:
+        runner.post_run()
+    runner.summary()
+    usage_flusher.flush()
+    logger.info(f"Finished running runner! Article:{article.id}")
+
+    logger.info(f"Article_output_dir: {directory}")
+
+    try:
+        artifacts = read_artifacts(directory, RESULT_ARTIFACTS)
+        final_content = artifacts["storm_gen_article_polished.txt"]
+        final_url_to_info = artifacts["url_to_info.json"]
+
+        try:
+            summary = final_content
+            if summary[0] == '#':
+                summary = ''.join(summary.split('\n')[1:])
+
+            update_article(session=session, db_article=article, article_in=ArticleUpdate(
+                title=article.title,
+                content_summary=summary[:200],
+                content=final_content,
+                url_to_info=final_url_to_info,
+                state=EnumArticleState.DONE,
+                state_content=""))
+
+            clear_checkpoint(redis_client, article.id)
+            try:
+                cache_article_view(article.id, final_content, final_url_to_info, article.content_hash)
+            except Exception as e:
+                logger.error(f"Failed to cache article view {article.id}: {e}")
+            if settings.OUTPUT_MODE == "disk" and settings.DELETE_ARTICLE_OUTPUT_DIR:
+                rmtree(util.output_directory(user_id, article.id))
+
+            logger.info("Finished updating article in db")
+            push_progress(redis_client, article.id, EnumArticleState.DONE, "", is_done=True)
+        except Exception as e:
+            logger.error(f"Failed to update article in db: {e}")
+            push_progress(redis_client, article.id, "fail_db", "Failed to update article in db", code=500)
+    except Exception as e:
+        logger.error(f"Failed to parse file: {e}")
+        push_progress(redis_client, article.id, "fail_file", "Failed to parse file", code=500)
+
+    end_progress(redis_client, article.id)
+
+    logger.info("Finished article generation")
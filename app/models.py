@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import field_validator
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, FetchedValue, Index, LargeBinary, text
 from sqlmodel import Field, SQLModel
 
 
@@ -21,6 +21,7 @@ class User(UserBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
     password: str
     status: int = Field(default=0)
+    token_used: int = Field(default=0)
 
 
 class UserPublic(UserBase):
@@ -50,18 +51,49 @@ class ArticleUpdate(ArticleBase):
 
 class Article(ArticleBase, table=True):
     __tablename__ = "article_info"
+    __table_args__ = (Index("idx_owner_status_cdate", "owner_id", "status", "cdate"),)
 
     id: int | None = Field(default=None, primary_key=True)
-    content: str | None = Field(default=None)
     content_summary: str | None = Field(default="")
-    url_to_info: str | None = Field(default=None)
+    # 正文和引用信息的摘要，只在内容变化时改变，用作渲染缓存和 ETag 的版本
+    content_hash: str = Field(default="", max_length=40)
     status: int = Field(default="0")
     state: str = Field(default="", max_length=50)
     state_content: str | None = Field(default="")
     owner_id: int = Field(nullable=False)
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    udate: datetime = Field(sa_column=Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"), server_onupdate=FetchedValue()), default=None)
     cdate: datetime = Field(sa_column=Column(DateTime, nullable=False, server_default="CURRENT_TIMESTAMP"), default=None)
 
 
+# 文章正文和引用信息，压缩后单独存放，只在读取全文时加载
+class ArticleContent(SQLModel, table=True):
+    __tablename__ = "article_content"
+
+    article_id: int = Field(primary_key=True)
+    content: bytes | None = Field(default=None, sa_column=Column(LargeBinary(length=16777215)))
+    url_to_info: bytes | None = Field(default=None, sa_column=Column(LargeBinary(length=16777215)))
+
+
+# 已完成文章的检索表，ngram 全文索引，由 crud 在写入和删除文章时维护
+class ArticleSearch(SQLModel, table=True):
+    __tablename__ = "article_search"
+    __table_args__ = (
+        Index("idx_owner", "owner_id"),
+        Index("ft_title", "title", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+        Index("ft_content_summary", "content_summary", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+        Index("ft_content", "content", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+        Index("ft_all", "title", "content_summary", "content", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
+
+    article_id: int = Field(primary_key=True)
+    owner_id: int
+    title: str = Field(default="")
+    content_summary: str = Field(default="")
+    content: str = Field(default="")
+
+
 class ArticleCreatePublic(ArticleBase):
     id: int
 
@@ -80,7 +112,16 @@ class ArticlePublic(ArticleBase):
 
 class ArticlesPublic(SQLModel):
     data: list[ArticlePublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
+
+
+class ArticleSearchPublic(ArticlePublic):
+    score: float
+
+
+class ArticleSearchResults(SQLModel):
+    data: list[ArticleSearchPublic]
 
 
 class ArticleInfoPublic(ArticleBase):
@@ -1,13 +1,27 @@
+import hashlib
 import json
 import os
 import re
+import struct
+import unicodedata
+import zlib
 
 from app.core.config import settings
 from app.core.log import logger
 
 
-def article_directory(account_id: int, title):
-    return os.path.join(settings.OUTPUT_DIR, str(account_id), title.replace(' ', '_').replace('/', '_'))
+def output_directory(account_id: int, article_id: int):
+    root = settings.MEMORY_OUTPUT_DIR if settings.OUTPUT_MODE == "memory" else settings.OUTPUT_DIR
+    return os.path.join(root, str(account_id), str(article_id))
+
+
+def article_directory(account_id: int, article_id: int, title):
+    # runner 在 output_dir 下按标题建目录，按文章分开，避免不同标题替换后同名
+    return os.path.join(output_directory(account_id, article_id), title.replace(' ', '_').replace('/', '_'))
+
+
+def normalize_topic(title: str):
+    return ' '.join(unicodedata.normalize('NFKC', title).lower().split())
 
 
 def add_inline_citation_link(article_text, citation_dict):
@@ -35,3 +49,34 @@ def construct_citation_dict(data):
         logger.error(f"JSON 解析错误: {e}")
 
     return citation_dict
+
+
+def render_article(content: str, url_to_info):
+    # 去掉标题行，引用编号替换为链接
+    if content[0] == '#':
+        content = '\n'.join(content.split('\n')[1:])
+    citation_dict = construct_citation_dict(url_to_info)
+    return add_inline_citation_link(content, citation_dict), citation_dict
+
+
+def content_hash(content: str, url_to_info: str | None) -> str:
+    return hashlib.sha1(f"{content}\x1f{url_to_info or ''}".encode()).hexdigest()[:16]
+
+
+# 与 MySQL COMPRESS()/UNCOMPRESS() 格式一致：4 字节小端原文长度 + zlib 数据
+def compress_text(text: str | None) -> bytes | None:
+    if text is None:
+        return None
+    data = text.encode()
+    if not data:
+        return b""
+    return struct.pack("<I", len(data)) + zlib.compress(data)
+
+
+def decompress_text(data: bytes | None) -> str | None:
+    if data is None:
+        return None
+    if not data:
+        return ""
+    # COMPRESS() 可能在末尾追加 '.'，用 decompressobj 忽略压缩流之后的数据
+    return zlib.decompressobj().decompress(data[4:]).decode()
@@ -0,0 +1,180 @@
+import signal
+import socket
+import threading
+import time
+
+import multiprocess
+from sqlmodel import Session
+
+from app.core import queue
+from app.core.config import settings
+from app.core.db import engine
+from app.core.log import logger
+from app.core.progress import push_progress, end_progress, state_buffer
+from app.core.usage import usage_flusher
+from app.core.redis import redis_client
+from app.enum import EnumArticleStatus
+from app.generate import article_generate
+from app.models import Article
+
+
+class Worker:
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = concurrency
+        self._stopping = threading.Event()
+        self._runners: list[threading.Thread] = []
+        self._running: set[int] = set()
+        self._running_lock = threading.Lock()
+        self._renewed_at = 0.0
+        self._reclaimed_at = 0.0
+
+    def stop(self, *args):
+        if not self._stopping.is_set():
+            logger.info(f"Worker {self.name} draining, waiting for running jobs to finish")
+        self._stopping.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        queue.recover(redis_client, self.name)
+        self._reclaim()
+
+        for i in range(self.concurrency):
+            # daemon 线程，超过 WORKER_DRAIN_TIMEOUT 后进程直接退出，未完成的任务由租约恢复
+            runner = threading.Thread(target=self._loop, name=f"{self.name}-runner-{i}", daemon=True)
+            runner.start()
+            self._runners.append(runner)
+        logger.info(f"Worker {self.name} started with {self.concurrency} runners")
+
+        # 主线程负责接收信号和续租，runner 线程在当前任务结束后退出
+        while not self._stopping.is_set():
+            self._stopping.wait(1)
+            self._renew()
+            self._reclaim()
+
+        deadline = time.monotonic() + settings.WORKER_DRAIN_TIMEOUT
+        for runner in self._runners:
+            while runner.is_alive() and time.monotonic() < deadline:
+                runner.join(min(1, max(deadline - time.monotonic(), 0)))
+                self._renew()
+        state_buffer.flush()
+        usage_flusher.flush()
+        if any(runner.is_alive() for runner in self._runners):
+            logger.error(f"Worker {self.name} drain timeout, unfinished jobs will be recovered after their leases expire")
+        else:
+            logger.info(f"Worker {self.name} stopped")
+
+    def _renew(self):
+        if time.monotonic() - self._renewed_at < settings.QUEUE_LEASE_TTL / 3:
+            return
+        self._renewed_at = time.monotonic()
+        with self._running_lock:
+            article_ids = list(self._running)
+        try:
+            queue.renew(redis_client, article_ids)
+            lost = queue.renew_articles(redis_client, article_ids, self.name)
+            if lost:
+                logger.error(f"Worker {self.name} lost article locks: {lost}")
+        except Exception as e:
+            logger.error(f"Failed to renew job leases: {e}")
+
+    def _reclaim(self):
+        if time.monotonic() - self._reclaimed_at < settings.QUEUE_LEASE_TTL:
+            return
+        self._reclaimed_at = time.monotonic()
+        try:
+            queue.reclaim(redis_client)
+        except Exception as e:
+            logger.error(f"Failed to reclaim expired jobs: {e}")
+
+    def _loop(self):
+        # redis 等异常不能结束 runner 线程，否则进程看似正常却不再执行任务
+        while not self._stopping.is_set():
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Worker {self.name} runner error: {e}")
+                self._stopping.wait(1)
+
+    def _step(self):
+        raw, job = queue.dequeue(redis_client, self.name)
+        if job is None:
+            # 队列为空或运行中的任务已达上限
+            self._stopping.wait(settings.QUEUE_POLL_INTERVAL)
+            return
+
+        processed = False
+        try:
+            processed = self._process(job)
+        finally:
+            # 重复的任务不释放正在执行的同一文章的租约
+            queue.ack(redis_client, self.name, raw, job["article_id"] if processed else None)
+
+    def _process(self, job: dict) -> bool:
+        article_id = job["article_id"]
+        logger.info(f"Worker {self.name} picked article {article_id}")
+
+        # 同一篇文章同一时间只由一个 runner 生成，重复的任务直接丢弃
+        with self._running_lock:
+            try:
+                if article_id in self._running or not queue.acquire_article(redis_client, article_id, self.name):
+                    logger.info(f"Skip article {article_id}, already running")
+                    return False
+            except Exception as e:
+                logger.error(f"Failed to lock article {article_id}: {e}")
+                return False
+            self._running.add(article_id)
+
+        try:
+            self._generate(job)
+        finally:
+            with self._running_lock:
+                self._running.discard(article_id)
+            queue.release_article(redis_client, article_id, self.name)
+        return True
+
+    def _generate(self, job: dict):
+        article_id = job["article_id"]
+        with Session(engine) as session:
+            try:
+                article = session.get(Article, article_id)
+                if not article or not article.status == EnumArticleStatus.VALID:
+                    logger.info(f"Skip article {article_id}, not available")
+                    return
+                article_generate(session, redis_client=redis_client, user_id=job["user_id"], article=article)
+            except Exception as e:
+                logger.error(f"Failed to generate article {article_id}: {e}")
+                push_progress(redis_client, article_id, "fail_generate", "Failed to generate article", code=500)
+                end_progress(redis_client, article_id)
+
+
+def _run_worker(name: str):
+    Worker(name, settings.WORKER_CONCURRENCY).run()
+
+
+def run():
+    name = settings.WORKER_NAME or socket.gethostname()
+
+    if settings.WORKER_PROCESSES <= 1:
+        _run_worker(name)
+        return
+
+    processes = [
+        multiprocess.Process(target=_run_worker, args=(f"{name}-{i}",), name=f"{name}-{i}")
+        for i in range(settings.WORKER_PROCESSES)
+    ]
+    for p in processes:
+        p.start()
+
+    def _forward(signum, frame):
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for p in processes:
+        p.join()
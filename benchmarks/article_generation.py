@@ -0,0 +1,74 @@
+"""Compare article drafting wall time: STORM's default section pool vs the configured one.
+
+Runs STORM's article generation module on a recorded outline with a fake
+article_gen_lm of fixed latency, so only the section scheduling differs.
+The baseline is the path before ARTICLE_GEN_CONCURRENCY existed: STORM's
+default max_thread_num (10) and no process-wide semaphore.
+
+    python -m benchmarks.article_generation --latency 2
+"""
+import argparse
+import os
+import threading
+import time
+
+from knowledge_storm.storm_wiki.modules.article_generation import StormArticleGenerationModule
+from knowledge_storm.storm_wiki.modules.storm_dataclass import StormArticle, StormInformationTable
+
+from app.core.config import settings
+from app.core.storm import OpenAIModel
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+TOPIC = "量子计算"
+# STORMWikiRunnerArguments.max_thread_num 的默认值
+STORM_MAX_THREAD_NUM = 10
+
+
+class RecordedInformationTable(StormInformationTable):
+    # 不加载向量模型，按顺序返回前 k 条资料
+    def prepare_table_for_retrieval(self):
+        pass
+
+    def retrieve_information(self, queries, search_top_k):
+        return list(self.url_to_info.values())[:search_top_k]
+
+
+class FixedLatencyModel(OpenAIModel):
+    def __init__(self, latency: float, **kwargs):
+        super().__init__(model="benchmark", api_key="benchmark", model_type="chat", **kwargs)
+        self.latency = latency
+
+    def request(self, prompt: str, **kwargs):
+        time.sleep(self.latency)
+        return {"choices": [{"finish_reason": "stop", "message": {"content": "# 章节\n章节内容[1]。"}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0}}
+
+
+def run(latency: float, concurrency: int, global_concurrency: int | None = None) -> float:
+    semaphore = threading.BoundedSemaphore(global_concurrency) if global_concurrency else None
+    lm = FixedLatencyModel(latency, concurrency=semaphore, max_tokens=700)
+    module = StormArticleGenerationModule(article_gen_lm=lm, retrieve_top_k=5, max_thread_num=concurrency)
+    information_table = RecordedInformationTable.from_conversation_log_file(os.path.join(DATA_DIR, "conversation_log.json"))
+    outline = StormArticle.from_outline_file(topic=TOPIC, file_path=os.path.join(DATA_DIR, "storm_gen_outline.txt"))
+
+    start = time.perf_counter()
+    module.generate_article(topic=TOPIC, information_table=information_table, article_with_outline=outline)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds per section LLM call")
+    parser.add_argument("--concurrency", type=int, default=settings.ARTICLE_GEN_CONCURRENCY, help="sections drafted concurrently per article")
+    parser.add_argument("--global-concurrency", type=int, default=settings.ARTICLE_GEN_GLOBAL_CONCURRENCY, help="process-wide cap of concurrent section calls")
+    args = parser.parse_args()
+
+    baseline = run(args.latency, STORM_MAX_THREAD_NUM)
+    configured = run(args.latency, args.concurrency, args.global_concurrency)
+    print(f"storm default ({STORM_MAX_THREAD_NUM} threads, no global cap): {baseline:.2f}s")
+    print(f"configured ({args.concurrency} per article, {args.global_concurrency} global): {configured:.2f}s")
+    print(f"speedup: {baseline / configured:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ CREATE TABLE `user` (
   `username` varchar(20) NOT NULL DEFAULT '',
   `password` varchar(64) NOT NULL DEFAULT '',
   `status` tinyint(4) unsigned NOT NULL DEFAULT '0',
+  `token_used` bigint unsigned NOT NULL DEFAULT '0',
   `udate` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   `cdate` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
@@ -13,14 +14,37 @@ CREATE TABLE `article_info` (
   `id` int unsigned NOT NULL AUTO_INCREMENT,
   `title` varchar(255) NOT NULL DEFAULT '',
   `content_summary` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci NOT NULL DEFAULT '',
-  `content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci,
-  `url_to_info` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci,
+  `content_hash` varchar(40) NOT NULL DEFAULT '',
   `owner_id` int unsigned NOT NULL DEFAULT '0',
   `status` tinyint NOT NULL DEFAULT '0',
   `state` varchar(50) NOT NULL DEFAULT '',
   `state_content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci,
+  `prompt_tokens` int unsigned NOT NULL DEFAULT '0',
+  `completion_tokens` int unsigned NOT NULL DEFAULT '0',
   `udate` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   `cdate` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
-  UNIQUE KEY `unq_title` (`owner_id`,`title`)
+  UNIQUE KEY `unq_title` (`owner_id`,`title`),
+  KEY `idx_owner_status_cdate` (`owner_id`,`status`,`cdate`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE `article_content` (
+  `article_id` int unsigned NOT NULL,
+  `content` mediumblob,
+  `url_to_info` mediumblob,
+  PRIMARY KEY (`article_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE `article_search` (
+  `article_id` int unsigned NOT NULL,
+  `owner_id` int unsigned NOT NULL DEFAULT '0',
+  `title` varchar(255) NOT NULL DEFAULT '',
+  `content_summary` varchar(255) NOT NULL DEFAULT '',
+  `content` mediumtext,
+  PRIMARY KEY (`article_id`),
+  KEY `idx_owner` (`owner_id`),
+  FULLTEXT KEY `ft_title` (`title`) WITH PARSER ngram,
+  FULLTEXT KEY `ft_content_summary` (`content_summary`) WITH PARSER ngram,
+  FULLTEXT KEY `ft_content` (`content`) WITH PARSER ngram,
+  FULLTEXT KEY `ft_all` (`title`,`content_summary`,`content`) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,6 @@
+ALTER TABLE `user`
+  ADD COLUMN `token_used` bigint unsigned NOT NULL DEFAULT '0' AFTER `status`;
+
+ALTER TABLE `article_info`
+  ADD COLUMN `prompt_tokens` int unsigned NOT NULL DEFAULT '0' AFTER `state_content`,
+  ADD COLUMN `completion_tokens` int unsigned NOT NULL DEFAULT '0' AFTER `prompt_tokens`;
@@ -0,0 +1,2 @@
+ALTER TABLE `article_info`
+  ADD KEY `idx_owner_status_cdate` (`owner_id`,`status`,`cdate`);
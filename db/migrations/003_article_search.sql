@@ -0,0 +1,18 @@
+CREATE TABLE `article_search` (
+  `article_id` int unsigned NOT NULL,
+  `owner_id` int unsigned NOT NULL DEFAULT '0',
+  `title` varchar(255) NOT NULL DEFAULT '',
+  `content_summary` varchar(255) NOT NULL DEFAULT '',
+  `content` mediumtext,
+  PRIMARY KEY (`article_id`),
+  KEY `idx_owner` (`owner_id`),
+  FULLTEXT KEY `ft_title` (`title`) WITH PARSER ngram,
+  FULLTEXT KEY `ft_content_summary` (`content_summary`) WITH PARSER ngram,
+  FULLTEXT KEY `ft_content` (`content`) WITH PARSER ngram,
+  FULLTEXT KEY `ft_all` (`title`,`content_summary`,`content`) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+INSERT INTO `article_search` (`article_id`, `owner_id`, `title`, `content_summary`, `content`)
+SELECT `id`, `owner_id`, `title`, `content_summary`, `content`
+FROM `article_info`
+WHERE `status` = 1 AND `content` IS NOT NULL;
@@ -0,0 +1,14 @@
+CREATE TABLE `article_content` (
+  `article_id` int unsigned NOT NULL,
+  `content` mediumblob,
+  `url_to_info` mediumblob,
+  PRIMARY KEY (`article_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- 与应用写入的格式一致，可用 UNCOMPRESS() 查看
+INSERT INTO `article_content` (`article_id`, `content`, `url_to_info`)
+SELECT `id`, COMPRESS(`content`), COMPRESS(`url_to_info`)
+FROM `article_info`
+WHERE `content` IS NOT NULL;
+
+ALTER TABLE `article_info` DROP COLUMN `content`, DROP COLUMN `url_to_info`;
@@ -0,0 +1,7 @@
+ALTER TABLE `article_info`
+  ADD COLUMN `content_hash` varchar(40) NOT NULL DEFAULT '' AFTER `content_summary`;
+
+-- 只作为版本号使用，不要求与应用计算的值一致
+UPDATE `article_info` a
+JOIN `article_content` c ON c.`article_id` = a.`id`
+SET a.`content_hash` = LEFT(SHA1(CONCAT(IFNULL(c.`content`, ''), IFNULL(c.`url_to_info`, ''))), 16);
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+# 测试不连接真实的 mysql/redis，只需满足配置校验
+os.environ.setdefault("PROJECT_NAME", "storm-server-test")
+os.environ.setdefault("LOG_PATH", tempfile.gettempdir())
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_USER", "root")
+os.environ.setdefault("REDIS_HOST", "localhost")
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    return fakeredis.FakeStrictRedis(server=redis_server)
+
+
+@pytest.fixture
+def async_redis_client(redis_server):
+    return fakeredis.FakeAsyncRedis(server=redis_server)
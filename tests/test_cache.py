@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core import cache
+from app.core.cache import SingleFlight, TieredCache
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch, redis_client, async_redis_client):
+    monkeypatch.setattr(cache, "redis_client", redis_client)
+    monkeypatch.setattr(cache, "async_redis_client", async_redis_client)
+
+
+def test_local_hit():
+    c = TieredCache("test_local", ttl=60)
+    c.set("k", {"v": 1})
+
+    assert c.get("k") == {"v": 1}
+    assert (c.local_hits, c.redis_hits, c.misses) == (1, 0, 0)
+
+
+def test_redis_hit_from_another_process(redis_client):
+    TieredCache("test_shared", ttl=60).set("k", [1, 2])
+    other = TieredCache("test_shared", ttl=60)
+
+    assert other.get("k") == [1, 2]
+    assert other.get("k") == [1, 2]
+    assert (other.local_hits, other.redis_hits) == (1, 1)
+    assert redis_client.ttl("storm:cache:test_shared:k") == 60
+
+
+def test_miss():
+    c = TieredCache("test_miss", ttl=60)
+
+    assert c.get("k") is None
+    assert c.misses == 1
+
+
+def test_local_ttl_falls_back_to_redis():
+    c = TieredCache("test_local_ttl", ttl=60, local_ttl=0)
+    c.set("k", "v")
+
+    assert c.get("k") == "v"
+    assert (c.local_hits, c.redis_hits) == (0, 1)
+
+
+def test_local_lru_eviction():
+    c = TieredCache("test_lru", ttl=60, maxsize=2)
+    for key in "abc":
+        c.set(key, key)
+
+    assert c.stats()["size"] == 2
+    assert c._get_local("a") is None
+    assert c.get("a") == "a"
+
+
+def test_delete():
+    c = TieredCache("test_delete", ttl=60)
+    c.set("k", "v")
+    c.delete("k")
+
+    assert c.get("k") is None
+
+
+def test_redis_maxsize_evicts_oldest(redis_client):
+    c = TieredCache("test_redis_max", ttl=60, redis_maxsize=2)
+    for key in "abc":
+        c.set(key, key)
+
+    assert redis_client.get("storm:cache:test_redis_max:a") is None
+    assert redis_client.zcard("storm:cache:test_redis_max") == 2
+    assert TieredCache("test_redis_max", ttl=60).get("c") == "c"
+
+
+def test_async_get_and_set():
+    c = TieredCache("test_async", ttl=60)
+
+    async def run():
+        await c.aset("k", {"v": 1})
+        return await TieredCache("test_async", ttl=60).aget("k"), await c.aget("missing")
+
+    assert asyncio.run(run()) == ({"v": 1}, None)
+
+
+def test_redis_errors_fall_back_to_miss(monkeypatch):
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(cache, "redis_client", Broken())
+    c = TieredCache("test_broken", ttl=60)
+
+    assert c.get("k") is None
+
+
+def test_single_flight_shares_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    second.start()
+    # 给第二个调用留出进入等待的时间
+    time.sleep(0.1)
+    release.set()
+    first.join()
+    second.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False), ("result", True)]
+
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    assert flight._calls == {}
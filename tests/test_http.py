@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import APIRouter, FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.http import CompressedRoute, article_etag, cache_headers, content_etag, not_modified
+from app.core.config import settings
+
+BODY = {"content": "x" * 4096}
+MODIFIED = datetime(2026, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESS_MIN_SIZE", 1024)
+    router = APIRouter(route_class=CompressedRoute)
+
+    @router.get("/big")
+    def big(response: Response):
+        response.headers.update(cache_headers(article_etag(1, "v1"), MODIFIED))
+        return BODY
+
+    @router.get("/small")
+    def small():
+        return {"a": 1}
+
+    @router.get("/cached")
+    def cached(request: Request, response: Response):
+        etag = article_etag(1, "v1")
+        if not_modified(request, etag, MODIFIED):
+            return Response(status_code=304, headers=cache_headers(etag, MODIFIED))
+        response.headers.update(cache_headers(etag, MODIFIED))
+        return BODY
+
+    @router.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["data: x\n\n"] * 500), media_type="text/event-stream")
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_gzip_large_body(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"1-v1-gzip"'
+    assert int(response.headers["content-length"]) < 1024
+    assert response.json() == BODY
+
+
+def test_raw_body_without_accept_encoding(client):
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"1-v1"'
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_small_body_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_streaming_response_not_compressed(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("if_none_match", ['"1-v1"', '"1-v1-gzip"', 'W/"1-v1-br"', '"other", "1-v1"', "*"])
+def test_if_none_match(client, if_none_match):
+    response = client.get("/cached", headers={"If-None-Match": if_none_match, "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_if_none_match_mismatch(client):
+    response = client.get("/cached", headers={"If-None-Match": '"1-v0"', "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.json() == BODY
+
+
+@pytest.mark.parametrize("if_modified_since, status_code", [
+    ("Fri, 01 May 2026 12:00:00 GMT", 304),
+    ("Fri, 01 May 2026 11:59:59 GMT", 200),
+    ("not a date", 200),
+])
+def test_if_modified_since(client, if_modified_since, status_code):
+    response = client.get("/cached", headers={"If-Modified-Since": if_modified_since})
+
+    assert response.status_code == status_code
+
+
+def test_if_none_match_takes_precedence(client):
+    response = client.get("/cached", headers={"If-None-Match": '"1-v0"', "If-Modified-Since": "Fri, 01 May 2026 12:00:00 GMT"})
+
+    assert response.status_code == 200
+
+
+def test_cache_headers():
+    headers = cache_headers('"e"', MODIFIED)
+
+    assert headers == {"ETag": '"e"', "Cache-Control": "private, no-cache", "Last-Modified": "Fri, 01 May 2026 12:00:00 GMT"}
+
+
+def test_content_etag_changes_with_content():
+    assert content_etag(1, "queued", "") == content_etag(1, "queued", "")
+    assert content_etag(1, "queued", "") != content_etag(1, "completed", "")
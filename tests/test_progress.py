@@ -0,0 +1,103 @@
+import json
+from contextlib import nullcontext
+
+import pytest
+
+from app.core import progress
+from app.core.progress import END, StateBuffer, end_progress, parse_event_id, progress_key, push_progress
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def __call__(self, *, session, states):
+        if self.fail:
+            raise ConnectionError("db down")
+        self.batches.append(states)
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(progress, "Session", lambda engine: nullcontext())
+    monkeypatch.setattr(progress, "update_article_states", recorder)
+    return recorder
+
+
+@pytest.fixture
+def buffer(monkeypatch, recorder):
+    # 不启动后台线程，由测试显式 flush
+    buffer = StateBuffer(interval=3600)
+    buffer._thread = object()
+    monkeypatch.setattr(progress, "state_buffer", buffer)
+    return buffer
+
+
+def test_flush_keeps_latest_state_per_article(buffer, recorder):
+    buffer.put(1, "pre_writing", "a")
+    buffer.put(1, "pre_writing_end", "b")
+    buffer.put(2, "queued", "c")
+
+    buffer.flush()
+
+    assert recorder.batches == [[
+        {"id": 1, "state": "pre_writing_end", "state_content": "b"},
+        {"id": 2, "state": "queued", "state_content": "c"},
+    ]]
+
+
+def test_flush_without_pending_states_skips_db(buffer, recorder):
+    buffer.flush()
+
+    assert recorder.batches == []
+
+
+def test_failed_flush_does_not_overwrite_newer_state(buffer, recorder):
+    buffer.put(1, "old", "")
+    recorder.fail = True
+    buffer.flush()
+
+    buffer.put(1, "new", "")
+    recorder.fail = False
+    buffer.flush()
+
+    assert recorder.batches == [[{"id": 1, "state": "new", "state_content": ""}]]
+
+
+def test_failed_flush_retries_on_next_flush(buffer, recorder):
+    buffer.put(1, "state", "")
+    recorder.fail = True
+    buffer.flush()
+
+    recorder.fail = False
+    buffer.flush()
+
+    assert recorder.batches == [[{"id": 1, "state": "state", "state_content": ""}]]
+
+
+def _events(redis_client, article_id):
+    return [fields[b"data"].decode() for _, fields in redis_client.xrange(progress_key(article_id))]
+
+
+def test_push_progress_publishes_and_buffers(redis_client, buffer):
+    push_progress(redis_client, 1, "pre_writing", "Preparing writing")
+    push_progress(redis_client, 1, "queued", persist=False)
+
+    events = [json.loads(e) for e in _events(redis_client, 1)]
+    assert [e["state"] for e in events] == ["pre_writing", "queued"]
+    assert buffer._pending == {1: {"id": 1, "state": "pre_writing", "state_content": "Preparing writing"}}
+
+
+def test_end_progress_flushes_states(redis_client, buffer, recorder):
+    push_progress(redis_client, 1, "completed", is_done=True)
+    end_progress(redis_client, 1)
+
+    assert _events(redis_client, 1)[-1] == END
+    assert recorder.batches == [[{"id": 1, "state": "completed", "state_content": ""}]]
+
+
+@pytest.mark.parametrize("event_id, expected", [(None, "0-0"), ("", "0-0"), ("abc", "0-0"), ("1712-3", "1712-3")])
+def test_parse_event_id(event_id, expected):
+    assert parse_event_id(event_id) == expected
@@ -0,0 +1,163 @@
+import pytest
+
+from app.core import queue
+from app.core.config import settings
+from app.enum import EnumJobPriority
+
+
+@pytest.fixture(autouse=True)
+def queue_settings(monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_MAX_DEPTH", 3)
+    monkeypatch.setattr(settings, "QUEUE_MAX_RUNNING", 2)
+    monkeypatch.setattr(settings, "QUEUE_JOB_COST", 180)
+    monkeypatch.setattr(settings, "QUEUE_LEASE_TTL", 120)
+    monkeypatch.setattr(settings, "ARTICLE_LOCK_TTL", 1800)
+
+
+def _expire_lease(redis_client, article_id):
+    redis_client.zadd(queue.RUNNING_KEY, {article_id: 1})
+
+
+def test_enqueue_rejects_normal_jobs_when_full(redis_client):
+    for article_id in range(3):
+        assert queue.enqueue(redis_client, user_id=article_id, article_id=article_id)
+
+    assert not queue.enqueue(redis_client, user_id=9, article_id=9)
+    assert queue.depth(redis_client) == 3
+
+
+def test_enqueue_accepts_high_priority_jobs_when_full(redis_client):
+    for article_id in range(3):
+        queue.enqueue(redis_client, user_id=article_id, article_id=article_id)
+
+    assert queue.enqueue(redis_client, user_id=9, article_id=9, priority=EnumJobPriority.HIGH)
+    assert queue.depth(redis_client) == 4
+
+
+def test_enqueue_deduplicates_waiting_article(redis_client):
+    assert queue.enqueue(redis_client, user_id=1, article_id=1)
+    assert queue.enqueue(redis_client, user_id=1, article_id=1)
+    assert queue.depth(redis_client) == 1
+
+
+def test_dequeue_high_priority_first(redis_client):
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+    queue.enqueue(redis_client, user_id=2, article_id=2, priority=EnumJobPriority.HIGH)
+
+    _, job = queue.dequeue(redis_client, "w")
+    assert job == {"user_id": 2, "article_id": 2}
+
+
+def test_dequeue_interleaves_users(redis_client, monkeypatch):
+    # 用户 1 先提交了多个任务，用户 2 的任务不排在它们全部之后
+    monkeypatch.setattr(settings, "QUEUE_MAX_DEPTH", 0)
+    monkeypatch.setattr(settings, "QUEUE_MAX_RUNNING", 0)
+    for article_id in [1, 2, 3]:
+        queue.enqueue(redis_client, user_id=1, article_id=article_id)
+    queue.enqueue(redis_client, user_id=2, article_id=4)
+
+    order = [queue.dequeue(redis_client, "w")[1]["article_id"] for _ in range(4)]
+    assert order.index(4) < order.index(3)
+
+
+def test_dequeue_respects_max_running(redis_client):
+    for article_id in range(3):
+        queue.enqueue(redis_client, user_id=article_id, article_id=article_id)
+
+    assert queue.dequeue(redis_client, "w")[1] is not None
+    assert queue.dequeue(redis_client, "w")[1] is not None
+    assert queue.dequeue(redis_client, "w") == (None, None)
+
+
+def test_ack_releases_lease(redis_client):
+    for article_id in range(3):
+        queue.enqueue(redis_client, user_id=article_id, article_id=article_id)
+    raw, job = queue.dequeue(redis_client, "w")
+    queue.dequeue(redis_client, "w")
+
+    queue.ack(redis_client, "w", raw, job["article_id"])
+
+    assert redis_client.llen(queue.processing_key("w")) == 1
+    assert queue.dequeue(redis_client, "w")[1] is not None
+
+
+def test_expired_lease_does_not_count_as_running(redis_client):
+    for article_id in range(3):
+        queue.enqueue(redis_client, user_id=article_id, article_id=article_id)
+    _, job = queue.dequeue(redis_client, "w")
+    queue.dequeue(redis_client, "w")
+
+    _expire_lease(redis_client, job["article_id"])
+
+    assert queue.dequeue(redis_client, "w")[1] is not None
+
+
+def test_duplicate_job_keeps_running_lease(redis_client):
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+    queue.dequeue(redis_client, "a")
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+
+    raw, _ = queue.dequeue(redis_client, "b")
+    queue.ack(redis_client, "b", raw, None)
+
+    assert redis_client.hget(queue.RUNNING_WORKERS_KEY, 1) == b"a"
+    assert redis_client.zscore(queue.RUNNING_KEY, 1) is not None
+
+
+def test_reclaim_requeues_expired_jobs_of_any_worker(redis_client):
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+    queue.dequeue(redis_client, "old-host")
+    assert queue.acquire_article(redis_client, 1, "old-host")
+
+    assert queue.reclaim(redis_client) == 0
+    _expire_lease(redis_client, 1)
+    assert queue.reclaim(redis_client) == 1
+
+    assert redis_client.llen(queue.processing_key("old-host")) == 0
+    assert not queue.is_running(redis_client, 1)
+    assert redis_client.zscore(queue.QUEUE_KEY, 1) < 1e11
+    assert redis_client.zcard(queue.RUNNING_KEY) == 0
+
+
+def test_recover_requeues_processing_jobs(redis_client):
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+    queue.dequeue(redis_client, "w")
+
+    assert queue.recover(redis_client, "w") == 1
+
+    assert redis_client.llen(queue.processing_key("w")) == 0
+    assert redis_client.zcard(queue.RUNNING_KEY) == 0
+    assert queue.dequeue(redis_client, "w")[1] == {"user_id": 1, "article_id": 1}
+
+
+def test_renew_extends_existing_leases_only(redis_client):
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+    queue.dequeue(redis_client, "w")
+    _expire_lease(redis_client, 1)
+
+    queue.renew(redis_client, [1, 2])
+
+    assert redis_client.zscore(queue.RUNNING_KEY, 1) > 1
+    assert redis_client.zscore(queue.RUNNING_KEY, 2) is None
+
+
+def test_article_lock(redis_client):
+    assert queue.acquire_article(redis_client, 1, "a")
+    assert not queue.acquire_article(redis_client, 1, "b")
+    assert queue.acquire_article(redis_client, 1, "a")
+
+    queue.release_article(redis_client, 1, "b")
+    assert queue.is_running(redis_client, 1)
+    queue.release_article(redis_client, 1, "a")
+    assert not queue.is_running(redis_client, 1)
+
+
+def test_renew_articles_returns_lost_locks(redis_client):
+    queue.acquire_article(redis_client, 1, "a")
+    redis_client.expire(queue.lock_key(1), 5)
+    queue.acquire_article(redis_client, 2, "b")
+
+    lost = queue.renew_articles(redis_client, [1, 2], "a")
+
+    assert lost == [queue.lock_key(2)]
+    assert redis_client.ttl(queue.lock_key(1)) == settings.ARTICLE_LOCK_TTL
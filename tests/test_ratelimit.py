@@ -0,0 +1,107 @@
+import pytest
+
+from app.core import ratelimit
+from app.core.config import settings
+from app.core.ratelimit import RateLimiter, RateLimitExceeded, estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch, redis_client):
+    monkeypatch.setattr(ratelimit, "redis_client", redis_client)
+    monkeypatch.setattr(ratelimit, "limiters", {})
+    monkeypatch.setattr(settings, "RATE_LIMIT_FAIR_WINDOW", 60)
+    monkeypatch.setattr(settings, "RATE_LIMIT_MAX_WAIT", 0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_FAIL_OPEN", False)
+
+
+def _bucket(redis_client, limiter, owner, kind="tpm"):
+    data = redis_client.hgetall(limiter._key(owner, kind))
+    return {k.decode(): float(v) for k, v in data.items()}
+
+
+def test_acquire_within_capacity(redis_client):
+    limiter = RateLimiter("test", rpm=10, tpm=6000)
+
+    assert limiter.acquire(1, 1000) < 0.1
+    assert _bucket(redis_client, limiter, "global")["tokens"] == pytest.approx(5000, abs=1)
+    assert _bucket(redis_client, limiter, "user:1")["tokens"] == pytest.approx(5000, abs=1)
+
+
+def test_acquire_raises_when_exhausted():
+    limiter = RateLimiter("test", rpm=1)
+    limiter.acquire(1)
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(1)
+    assert limiter.stats()["process"]["rejected"] == 1
+
+
+def test_acquire_fail_open(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_FAIL_OPEN", True)
+    limiter = RateLimiter("test", rpm=1)
+    limiter.acquire(1)
+
+    limiter.acquire(1)
+    assert limiter.stats()["process"]["requests"] == 2
+
+
+def test_acquire_max_wait_override(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_MAX_WAIT", 120)
+    limiter = RateLimiter("test", rpm=1)
+    limiter.acquire(1)
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(1, max_wait=0)
+
+
+def test_active_users_share_user_buckets(redis_client):
+    limiter = RateLimiter("test", rpm=60, tpm=6000)
+    limiter.acquire(1, 0)
+    limiter.acquire(2, 0)
+
+    # 两个活跃用户各分到一半的额度
+    limiter.acquire(1, 2900)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(1, 500)
+    limiter.acquire(2, 2900)
+
+
+def test_adjust_refunds_and_clamps_to_capacity(redis_client):
+    limiter = RateLimiter("test", rpm=10, tpm=6000)
+    limiter.acquire(1, 5000)
+
+    limiter.adjust(1, 10000)
+
+    bucket = _bucket(redis_client, limiter, "global")
+    assert bucket["tokens"] == pytest.approx(6000)
+    assert "ts" in bucket
+    assert redis_client.ttl(limiter._key("global", "tpm")) > 0
+
+
+def test_adjust_skips_refund_of_expired_bucket(redis_client):
+    limiter = RateLimiter("test", rpm=10, tpm=6000)
+    limiter.acquire(1, 5000)
+    redis_client.delete(limiter._key("global", "tpm"), limiter._key("user:1", "tpm"))
+
+    limiter.adjust(1, 4000)
+
+    assert not redis_client.exists(limiter._key("global", "tpm"))
+    assert not redis_client.exists(limiter._key("user:1", "tpm"))
+    limiter.acquire(1, 5000)
+
+
+def test_adjust_debits_expired_bucket_with_ttl(redis_client):
+    limiter = RateLimiter("test", rpm=10, tpm=6000)
+    limiter.acquire(1, 100)
+    redis_client.delete(limiter._key("global", "tpm"))
+
+    limiter.adjust(1, -1000)
+
+    assert _bucket(redis_client, limiter, "global")["tokens"] == pytest.approx(5000, abs=1)
+    assert redis_client.ttl(limiter._key("global", "tpm")) > 0
+
+
+def test_estimate_tokens():
+    messages = [{"role": "user", "content": "x" * 100}]
+
+    assert estimate_tokens(messages, max_tokens=50, n=2) == 150
@@ -0,0 +1,83 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import storm
+from app.core.config import settings
+from app.core.progress import progress_key
+from app.core.storm import CallbackHandler, OpenAIModel
+
+PROMPT = "The section you need to write: 历史"
+
+
+def _events(redis_client, article_id):
+    return [json.loads(fields[b"data"]) for _, fields in redis_client.xrange(progress_key(article_id))]
+
+
+def _chunk(content=None, finish_reason=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)]
+    return SimpleNamespace(id="c", model="m", usage=None, choices=choices)
+
+
+class FakeClient:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        def stream():
+            yield from self.chunks
+            if self.error:
+                raise self.error
+        return stream()
+
+
+@pytest.fixture
+def handler(monkeypatch, redis_client):
+    monkeypatch.setattr(settings, "STREAM_FLUSH_INTERVAL", 0)
+    return CallbackHandler(redis_client, 1)
+
+
+def _model(monkeypatch, handler, client):
+    monkeypatch.setattr(storm, "openai_client", lambda: client)
+    lm = OpenAIModel(api_key="test")
+    lm.stream_handler = handler.on_lm_stream
+    return lm
+
+
+def test_stream_done_after_success(monkeypatch, redis_client, handler):
+    lm = _model(monkeypatch, handler, FakeClient([_chunk("# 历史"), _chunk("\n..."), _chunk(finish_reason="stop")]))
+
+    response = lm._stream_request(PROMPT, [], {})
+
+    assert response["choices"][0]["message"]["content"] == "# 历史\n..."
+    events = _events(redis_client, 1)
+    assert "".join(e["message"] for e in events) == "# 历史\n..."
+    assert [e["section_done"] for e in events][-1] is True
+    assert not any(e["section_reset"] for e in events)
+
+
+def test_stream_failure_resets_section(monkeypatch, redis_client, handler):
+    lm = _model(monkeypatch, handler, FakeClient([_chunk("# 历")], error=ConnectionError("reset by peer")))
+
+    with pytest.raises(ConnectionError):
+        lm._stream_request(PROMPT, [], {})
+
+    events = _events(redis_client, 1)
+    assert not any(e["section_done"] for e in events)
+    assert events[-1]["section_reset"] is True
+    assert events[-1]["message"] == ""
+
+    # 重试从该章节开头推送
+    sent = len(events)
+    monkeypatch.setattr(storm, "openai_client", lambda: FakeClient([_chunk("# 历史")]))
+    lm._stream_request(PROMPT, [], {})
+    assert "".join(e["message"] for e in _events(redis_client, 1)[sent:]) == "# 历史"
+
+
+def test_reset_before_any_text_sends_nothing(redis_client, handler):
+    handler.on_lm_stream(PROMPT, "", False, reset=True)
+
+    assert _events(redis_client, 1) == []
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from app import worker
+from app.core import queue
+from app.core.config import settings
+
+
+@pytest.fixture
+def runner(monkeypatch, redis_client):
+    monkeypatch.setattr(worker, "redis_client", redis_client)
+    monkeypatch.setattr(settings, "QUEUE_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "QUEUE_MAX_DEPTH", 0)
+    monkeypatch.setattr(settings, "QUEUE_MAX_RUNNING", 0)
+    w = worker.Worker("test", concurrency=1)
+    w.generated = []
+    monkeypatch.setattr(w, "_generate", lambda job: w.generated.append(job["article_id"]))
+    # 出错后的退避不拖慢测试
+    monkeypatch.setattr(w._stopping, "wait", lambda timeout=None: w._stopping.is_set())
+    return w
+
+
+def _run_until(w, done):
+    thread = threading.Thread(target=w._loop, daemon=True)
+    thread.start()
+    for _ in range(500):
+        if done():
+            break
+        threading.Event().wait(0.01)
+    w.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_runner_survives_redis_errors(runner, redis_client, monkeypatch):
+    ack = queue.ack
+    failures = []
+
+    def flaky_ack(*args):
+        if not failures:
+            failures.append(1)
+            raise ConnectionError("redis down")
+        ack(*args)
+
+    monkeypatch.setattr(queue, "ack", flaky_ack)
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+    queue.enqueue(redis_client, user_id=2, article_id=2)
+
+    _run_until(runner, lambda: len(runner.generated) == 2)
+
+    assert runner.generated == [1, 2]
+    assert failures == [1]
+
+
+def test_runner_survives_dequeue_errors(runner, redis_client, monkeypatch):
+    dequeue = queue.dequeue
+    failures = []
+
+    def flaky_dequeue(*args):
+        if len(failures) < 2:
+            failures.append(1)
+            raise ConnectionError("redis down")
+        return dequeue(*args)
+
+    monkeypatch.setattr(queue, "dequeue", flaky_dequeue)
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+
+    _run_until(runner, lambda: runner.generated == [1])
+
+    assert runner.generated == [1]
+
+
+def test_duplicate_job_is_skipped(runner, redis_client):
+    queue.acquire_article(redis_client, 1, "other")
+    queue.enqueue(redis_client, user_id=1, article_id=1)
+
+    _run_until(runner, lambda: queue.depth(redis_client) == 0 and not redis_client.llen(queue.processing_key("test")))
+
+    assert runner.generated == []
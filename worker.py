@@ -0,0 +1,14 @@
+import os
+
+from app.core.config import settings
+from app.core.log import logger
+from app import worker
+
+if settings.HTTP_PROXY:
+    logger.info(f"set http_proxy to {settings.HTTP_PROXY}")
+    os.environ['http_proxy'] = settings.HTTP_PROXY
+    os.environ['https_proxy'] = settings.HTTP_PROXY
+
+
+if __name__ == "__main__":
+    worker.run()